@@ -0,0 +1,215 @@
+"""Benchmark create_ontologies.py on synthetic ICTV data.
+
+For every scale factor, generates a synthetic data set (see synthetic_data.py)
+in a scratch directory, runs the build there and reports:
+
+- the wall time, CPU time, rows and triples of each build stage, from the
+  build's --report,
+- the peak RSS of the build process and of the whole process tree
+  (build process plus its workers, sampled),
+- the number of triples of the combined ontology and of each release file.
+
+Results can be written as JSON and compared against an earlier JSON report
+to catch regressions offline:
+
+    python benchmarks/run_benchmarks.py --scale 1 10 --json bench.json
+    python benchmarks/run_benchmarks.py --scale 1 10 --baseline bench.json
+
+Arguments after -- are passed on to create_ontologies.py.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import rdflib
+
+from synthetic_data import generate
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def tree_rss(pid):
+    # Resident memory (bytes) of a process and all its descendants, from /proc
+    children = {}
+    rss = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/status') as f:
+                status = dict(line.split(':', 1) for line in f if ':' in line)
+        except OSError:
+            continue
+        children.setdefault(int(status['PPid']), []).append(int(entry))
+        rss[int(entry)] = int(status.get('VmRSS', '0 kB').split()[0]) * 1024
+
+    total = 0
+    todo = [pid]
+    while todo:
+        p = todo.pop()
+        total += rss.get(p, 0)
+        todo.extend(children.get(p, []))
+    return total
+
+
+def count_triples(path):
+    # Release files and --streaming output are N-Triples: one triple per line
+    with open(path, encoding='utf-8') as f:
+        first = f.readline()
+        if first.startswith(('<', '_:')):
+            return 1 + sum(1 for line in f if line.strip())
+    g = rdflib.Graph()
+    g.parse(path, format='ttl')
+    return len(g)
+
+
+def run_build(work_dir, build_args, python):
+    peak_tree_rss = [0]
+    done = threading.Event()
+    report_file = os.path.join(work_dir, 'build_report.json')
+
+    proc = subprocess.Popen(
+        [python, os.path.join(REPO_DIR, 'create_ontologies.py'), '--report', report_file] + build_args,
+        cwd=work_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1,
+    )
+
+    def sample():
+        while not done.is_set():
+            peak_tree_rss[0] = max(peak_tree_rss[0], tree_rss(proc.pid))
+            done.wait(0.1)
+
+    sampler = None
+    if os.path.isdir('/proc'):
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+
+    start = time.perf_counter()
+    log = proc.stdout.readlines()
+
+    _, status, rusage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.perf_counter() - start
+    done.set()
+    if sampler:
+        sampler.join()
+
+    if proc.returncode != 0:
+        sys.stderr.write(''.join(log))
+        raise SystemExit(f'create_ontologies.py failed with exit code {proc.returncode}')
+
+    with open(report_file) as f:
+        build_report = json.load(f)
+
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    peak_rss = rusage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+    return {
+        'wall_s': wall,
+        'peak_rss_mb': peak_rss / 2**20,
+        'peak_tree_rss_mb': peak_tree_rss[0] / 2**20 if sampler else None,
+        'stages': build_report['stages'],
+        'releases': build_report['releases'],
+    }
+
+
+def benchmark(scale, releases, seed, build_args, python, keep):
+    work_dir = tempfile.mkdtemp(prefix=f'ictv-bench-{scale}x-')
+    try:
+        counts = generate(os.path.join(work_dir, 'data'), scale=scale, releases=releases, seed=seed)
+        os.makedirs(os.path.join(work_dir, 'out'))
+        for f in ['imported_terms.ttl', 'supporting_ontologies.json']:
+            shutil.copy(os.path.join(REPO_DIR, f), work_dir)
+
+        result = run_build(work_dir, build_args, python)
+
+        out_dir = os.path.join(work_dir, 'out')
+        result['inputs'] = counts
+        result['triples'] = count_triples(os.path.join(out_dir, 'ictv_all_versions.owl.ttl'))
+        result['release_triples'] = {
+            f.split('.')[0]: count_triples(os.path.join(out_dir, f))
+            for f in sorted(os.listdir(out_dir))
+            if f.startswith('MSL') and f.endswith('.owl.ttl')
+        }
+        result['scale'] = scale
+        return result
+    finally:
+        if keep:
+            print(f'Kept {work_dir}')
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def report(result):
+    print(f"\nScale {result['scale']}x: {result['inputs']['nodes']} nodes, {result['inputs']['delta']} delta rows, {result['inputs']['isolates']} isolates")
+    print(f"  {'stage':<50} {'wall':>9} {'cpu':>9} {'rows':>9} {'triples':>9}")
+    for stage in result['stages']:
+        print(f"  {stage['stage']:<50} {stage['wall_s']:8.2f}s {stage['cpu_s']:8.2f}s {stage['rows']:>9} {stage['triples']:>9}")
+    print(f"  {'total':<50} {result['wall_s']:8.2f}s")
+    print(f"  peak RSS {result['peak_rss_mb']:.0f} MB (build process)", end='')
+    if result['peak_tree_rss_mb'] is not None:
+        print(f", {result['peak_tree_rss_mb']:.0f} MB (with workers)", end='')
+    print(f"\n  {result['triples']} triples in ictv_all_versions.owl.ttl, {sum(result['release_triples'].values())} in {len(result['release_triples'])} release files")
+
+
+def compare(results, baseline, tolerance):
+    # Report the measures that got worse than the baseline by more than tolerance
+    regressions = []
+    previous = {r['scale']: r for r in baseline}
+    for result in results:
+        before = previous.get(result['scale'])
+        if not before:
+            continue
+        for measure in ['wall_s', 'peak_rss_mb', 'peak_tree_rss_mb']:
+            if result.get(measure) and before.get(measure) and result[measure] > before[measure] * (1 + tolerance):
+                regressions.append(f"scale {result['scale']}x: {measure} {before[measure]:.2f} -> {result[measure]:.2f}")
+        if result['triples'] != before['triples']:
+            regressions.append(f"scale {result['scale']}x: triples {before['triples']} -> {result['triples']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark create_ontologies.py on synthetic ICTV data')
+    parser.add_argument('--scale', type=float, nargs='+', default=[1, 10], help='scale factors to benchmark (default: 1 10)')
+    parser.add_argument('--releases', type=int, default=40, help='number of MSL releases (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the data generator (default: %(default)s)')
+    parser.add_argument('--python', default=sys.executable, help='Python interpreter running the build (default: this one)')
+    parser.add_argument('--json', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown/growth against the baseline (default: %(default)s)')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch directories')
+    parser.add_argument('build_args', nargs='*', help='arguments passed to create_ontologies.py (after --)')
+    args = parser.parse_args()
+
+    # synthetic data always needs a full build
+    build_args = args.build_args if '--no-cache' in args.build_args else ['--no-cache'] + args.build_args
+
+    results = []
+    for scale in args.scale:
+        result = benchmark(scale, args.releases, args.seed, build_args, args.python, args.keep)
+        report(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print('\nRegressions against ' + args.baseline + ':')
+            for regression in regressions:
+                print('  ' + regression)
+            sys.exit(1)
+        print('\nNo regressions against ' + args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""Generate synthetic ICTVdatabase input files for benchmarking create_ontologies.py.
+
+Writes taxonomy_node_export.utf8.txt, taxonomy_node_delta.utf8.txt and
+species_isolates.utf8.txt shaped like the real ICTVdatabase export: one
+taxonomy tree per MSL release with the full rank hierarchy, a delta row for
+every taxon carried over between consecutive releases (so every taxon has a
+revision chain spanning all of its releases), renames, moves, merges, splits,
+deletions and new taxa, isolates of the latest release with multi-valued
+names and accessions, and a few malformed node lines with a trailing extra
+field like the real export.
+
+Scale factor 1 gives about 150 species in the latest release, 100 is close to
+the size of the current ICTV taxonomy. Like the real taxonomy, the first
+release has about a fifth of the species of the latest one.
+
+    python benchmarks/synthetic_data.py --scale 10 data/
+"""
+
+import argparse
+import os
+import random
+
+NODE_COLUMNS = ['taxnode_id', 'parent_id', 'tree_id', 'msl_release_num', 'level_id', 'name', 'ictv_id',
+                'molecule_id', 'abbrev_csv', 'genbank_accession_csv', 'refseq_accession_csv', 'isolate_csv',
+                'notes', 'is_ref', 'is_official', 'is_hidden', 'rank']
+DELTA_COLUMNS = ['prev_taxid', 'new_taxid', 'proposal', 'notes', 'is_merged', 'is_split', 'is_moved',
+                 'is_promoted', 'is_demoted', 'is_renamed', 'is_new', 'is_deleted', 'is_now_type',
+                 'is_lineage_updated', 'msl']
+ISOLATE_COLUMNS = ['isolate_id', 'taxnode_id', 'species_name', 'isolate_names', 'isolate_abbrevs',
+                   'genbank_accessions', 'refseq_accessions', 'molecule', 'host_source']
+
+# rank -> level_id, from the root of a release tree down to species
+LEVELS = {
+    'realm': '105', 'kingdom': '110', 'phylum': '120', 'class': '140', 'order': '160',
+    'family': '200', 'subfamily': '250', 'genus': '300', 'subgenus': '400', 'species': '500',
+}
+
+# number of taxa of each rank per species of the latest release, and the
+# ranks a taxon of each rank can be placed under
+SHAPE = [
+    ('realm', 1 / 150, []),
+    ('kingdom', 1 / 100, ['realm']),
+    ('phylum', 1 / 60, ['kingdom']),
+    ('class', 1 / 40, ['phylum']),
+    ('order', 1 / 25, ['class']),
+    ('family', 1 / 12, ['order']),
+    ('subfamily', 1 / 40, ['family']),
+    ('genus', 1 / 5, ['family', 'subfamily']),
+    ('subgenus', 1 / 50, ['genus']),
+]
+
+SUFFIXES = {
+    'realm': 'viria', 'kingdom': 'virae', 'phylum': 'viricota', 'class': 'viricetes', 'order': 'virales',
+    'family': 'viridae', 'subfamily': 'virinae', 'genus': 'virus', 'subgenus': 'virus',
+}
+
+FLAGS = ['is_merged', 'is_split', 'is_moved', 'is_promoted', 'is_demoted', 'is_renamed', 'is_new',
+         'is_deleted', 'is_now_type', 'is_lineage_updated']
+
+
+def generate(out_dir, scale=1, releases=40, seed=0, change_rate=0.03, bad_line_rate=0.001):
+    rnd = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+
+    next_id = [19700000]
+
+    def new_id():
+        next_id[0] += 1
+        return str(next_id[0])
+
+    def syllables(n):
+        return ''.join(rnd.choice(['ba', 'co', 'di', 'fe', 'gu', 'ha', 'ki', 'lo', 'mu', 'ne', 'po', 'ra', 'si', 'tu', 'vi', 'ze'])
+                       for _ in range(n)).capitalize()
+
+    # ictv_id -> {'name', 'rank', 'parent', 'abbrev'}, the taxa of the current release
+    taxa = {}
+    by_rank = {}
+    n_species = max(20, int(150 * scale))
+    # grow from a fifth of the species to n_species over the releases
+    growth_rate = 5 ** (1 / max(1, releases - 1)) - 1
+
+    for rank, per_species, parent_ranks in SHAPE:
+        by_rank[rank] = []
+        for _ in range(max(1, round(n_species * per_species))):
+            parents = [p for r in parent_ranks for p in by_rank[r]]
+            ictv_id = new_id()
+            taxa[ictv_id] = {'name': syllables(3) + SUFFIXES[rank], 'rank': rank,
+                             'parent': rnd.choice(parents) if parents else None, 'abbrev': None}
+            by_rank[rank].append(ictv_id)
+
+    def species_parents():
+        return by_rank['genus'] + by_rank['subgenus']
+
+    def new_species():
+        ictv_id = new_id()
+        taxa[ictv_id] = {'name': f'{syllables(2)} {syllables(3).lower()} virus', 'rank': 'species',
+                         'parent': rnd.choice(species_parents()),
+                         'abbrev': (syllables(1).upper() + 'V' if rnd.random() < 0.3 else None)}
+        return ictv_id
+
+    for _ in range(n_species // 5):
+        new_species()
+
+    nodes, deltas, isolates = [], [], []
+    previous = None  # ictv_id -> taxnode_id in the previous release
+    isolate_id = 0
+    growth = 0
+
+    for release in range(1, releases + 1):
+        msl = str(release)
+        tree_id = str((1970 + release) * 100000)
+        nodes.append({'taxnode_id': tree_id, 'parent_id': tree_id, 'tree_id': tree_id, 'msl_release_num': msl,
+                      'level_id': '100', 'name': str(1970 + release), 'ictv_id': tree_id, 'rank': 'tree'})
+
+        # changes since the previous release: ictv_id -> (kind, [ictv_ids replacing it])
+        changes = {}
+        merge_targets = set()
+        if previous is not None:
+            species = [t for t in taxa if taxa[t]['rank'] == 'species']
+            for ictv_id in rnd.sample(species, max(1, int(len(species) * change_rate))):
+                if ictv_id not in taxa or ictv_id in merge_targets:
+                    continue
+                kind = rnd.choice(['renamed', 'renamed', 'moved', 'merged', 'split', 'deleted'])
+                if kind == 'renamed':
+                    taxa[ictv_id] = dict(taxa[ictv_id], name=f'{syllables(2)} {syllables(3).lower()} virus')
+                    changes[ictv_id] = (kind, [ictv_id])
+                elif kind == 'moved':
+                    taxa[ictv_id] = dict(taxa[ictv_id], parent=rnd.choice(species_parents()))
+                    changes[ictv_id] = (kind, [ictv_id])
+                elif kind == 'merged':
+                    targets = [t for t in species if t in taxa and t != ictv_id and t not in changes]
+                    if not targets:
+                        continue
+                    del taxa[ictv_id]
+                    target = rnd.choice(targets)
+                    merge_targets.add(target)
+                    changes[ictv_id] = (kind, [target])
+                elif kind == 'split':
+                    old = taxa.pop(ictv_id)
+                    parts = []
+                    for part in ['A', 'B']:
+                        part_id = new_id()
+                        taxa[part_id] = dict(old, name=f'{old["name"]} {part}')
+                        parts.append(part_id)
+                    changes[ictv_id] = (kind, parts)
+                else:
+                    del taxa[ictv_id]
+                    changes[ictv_id] = (kind, [])
+            growth += len(species) * growth_rate
+            while growth >= 1:
+                changes[new_species()] = ('new', [])
+                growth -= 1
+
+        counter = [0]
+
+        def taxnode_id():
+            counter[0] += 1
+            return str(int(tree_id) + counter[0])
+
+        current = {ictv_id: taxnode_id() for ictv_id in taxa}
+        for ictv_id, taxon in taxa.items():
+            nodes.append({
+                'taxnode_id': current[ictv_id],
+                'parent_id': current[taxon['parent']] if taxon['parent'] else tree_id,
+                'tree_id': tree_id,
+                'msl_release_num': msl,
+                'level_id': LEVELS[taxon['rank']],
+                'name': taxon['name'],
+                'ictv_id': ictv_id,
+                'molecule_id': rnd.choice(['1', '2', '3', '4']) if taxon['rank'] == 'species' else None,
+                'abbrev_csv': taxon['abbrev'],
+                'is_ref': '0',
+                'is_official': '1',
+                'is_hidden': '0',
+                'rank': taxon['rank'],
+            })
+
+        if previous is not None:
+            for ictv_id, prev_taxid in previous.items():
+                kind, targets = changes.get(ictv_id, ('unchanged', [ictv_id]))
+                row = {'prev_taxid': prev_taxid, 'msl': msl, 'proposal': f'{1970 + release}.{rnd.randint(1, 999):03d}' if kind != 'unchanged' else None}
+                row.update({flag: '0' for flag in FLAGS})
+                if kind == 'unchanged':
+                    row['is_lineage_updated'] = '1' if rnd.random() < 0.05 else '0'
+                elif kind != 'new':
+                    row['is_' + kind] = '1'
+                if not targets:
+                    deltas.append(dict(row, new_taxid=None))
+                for target in targets:
+                    deltas.append(dict(row, new_taxid=current.get(target)))
+            for ictv_id, (kind, _) in changes.items():
+                if kind == 'new':
+                    row = {flag: '0' for flag in FLAGS}
+                    deltas.append(dict(row, prev_taxid=None, new_taxid=current[ictv_id], msl=msl, is_new='1'))
+
+        previous = current
+
+    # isolates (VMR) refer to the species of the latest release
+    for ictv_id, taxon in taxa.items():
+        if taxon['rank'] != 'species':
+            continue
+        for _ in range(rnd.choice([1, 1, 1, 2, 3])):
+            isolate_id += 1
+            segments = rnd.choice([1, 1, 1, 2, 3])
+            names = [f'{taxon["name"]} isolate {syllables(2)}{rnd.randint(1, 99)}' for _ in range(rnd.choice([1, 1, 2]))]
+            genbank = [f'{rnd.choice(["MN", "MT", "AB", "KX"])}{rnd.randint(100000, 999999)}' for _ in range(segments)]
+            if segments > 1 and rnd.random() < 0.5:
+                genbank = [f'{segment}: {acc}' for segment, acc in zip(['DNA-A', 'DNA-B', 'DNA-C'], genbank)]
+            isolates.append({
+                'isolate_id': str(isolate_id),
+                'taxnode_id': previous[ictv_id],
+                'species_name': taxon['name'],
+                'isolate_names': rnd.choice(['; ', ', ']).join(names),
+                'isolate_abbrevs': syllables(1).upper() + str(isolate_id) if rnd.random() < 0.6 else None,
+                'genbank_accessions': '; '.join(genbank),
+                'refseq_accessions': '; '.join(f'NC_{rnd.randint(1, 99999):06d}' for _ in range(segments)) if rnd.random() < 0.4 else None,
+                'molecule': rnd.choice(['ssRNA(+)', 'dsDNA', 'ssDNA']),
+                'host_source': rnd.choice(['vertebrates', 'plants', 'bacteria', 'invertebrates']),
+            })
+
+    write_tsv(os.path.join(out_dir, 'taxonomy_node_export.utf8.txt'), NODE_COLUMNS, nodes, rnd, bad_line_rate)
+    write_tsv(os.path.join(out_dir, 'taxonomy_node_delta.utf8.txt'), DELTA_COLUMNS, deltas)
+    write_tsv(os.path.join(out_dir, 'species_isolates.utf8.txt'), ISOLATE_COLUMNS, isolates)
+
+    return {'releases': releases, 'nodes': len(nodes), 'delta': len(deltas), 'isolates': len(isolates)}
+
+
+def write_tsv(path, columns, rows, rnd=None, bad_line_rate=0):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write('\t'.join(columns) + '\n')
+        for row in rows:
+            line = '\t'.join(row.get(c) or '' for c in columns)
+            # the real node export has a few lines with one field too many
+            if rnd is not None and row.get('level_id') != '100' and rnd.random() < bad_line_rate:
+                line += '\t'
+            f.write(line + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic ICTVdatabase TSV files')
+    parser.add_argument('out_dir', help='directory to write the TSV files to (e.g. data/)')
+    parser.add_argument('--scale', type=float, default=1, help='size factor, 1 is about 150 species per release, 100 about the current ICTV (default: %(default)s)')
+    parser.add_argument('--releases', type=int, default=40, help='number of MSL releases (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: %(default)s)')
+    args = parser.parse_args()
+
+    counts = generate(args.out_dir, scale=args.scale, releases=args.releases, seed=args.seed)
+    print(f"Generated {counts['releases']} releases, {counts['nodes']} nodes, {counts['delta']} delta rows and {counts['isolates']} isolates in {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
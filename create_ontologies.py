@@ -2,6 +2,7 @@
 # requires-python = ">=3.13"
 # dependencies = [
 #     "pandas",
+#     "pyarrow",
 #     "rdflib",
 # ]
 # ///
@@ -12,11 +13,27 @@ from rdflib import URIRef, BNode, Literal
 from rdflib.collection import Collection
 from rdflib.namespace import OWL, RDFS, RDF, PROV, FOAF, SKOS
 import pandas as pd
+import numpy as np
 import os
 import json
 import re
+import gzip
+import sys
+import time
+import argparse
+import hashlib
+import shutil
+import cProfile
+import resource
+import multiprocessing
+from contextlib import contextmanager
+from itertools import groupby
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
+import ictv_ingest
+import ictv_resolver
+import ictv_canonical
+
 TERM_REPLACED_BY = "http://purl.obolibrary.org/obo/IAO_0100001"
 OBSOLESCENCE_REASON = "http://purl.obolibrary.org/obo/IAO_0000225"
 TERM_SPLIT = "http://purl.obolibrary.org/obo/IAO_0000229"
@@ -34,6 +51,55 @@ RANK = "http://purl.obolibrary.org/obo/TAXRANK_1000000"
 WAS_REVISION_OF = "http://www.w3.org/ns/prov#wasRevisionOf"
 HAD_REVISION = "http://www.w3.org/ns/prov#hadRevision"
 
+# delta flags describing how a taxon changed in the next release
+# (is_lineage_updated: an ancestor changed but the taxon itself not necessarily)
+CHANGE_FLAGS = ['is_merged', 'is_split', 'is_moved', 'is_promoted', 'is_demoted', 'is_renamed', 'is_new', 'is_deleted', 'is_lineage_updated']
+
+
+# ICTV rank -> TAXRANK term
+RANKS = {
+    "realm": "http://purl.obolibrary.org/obo/TAXRANK_0001004", # clade
+    "kingdom": "http://purl.obolibrary.org/obo/TAXRANK_0000017",
+    "subkingdom": "http://purl.obolibrary.org/obo/TAXRANK_0000029",
+    "phylum": "http://purl.obolibrary.org/obo/TAXRANK_0000001",
+    "subphylum": "http://purl.obolibrary.org/obo/TAXRANK_0000008",
+    "class": "http://purl.obolibrary.org/obo/TAXRANK_0000002",
+    "subclass": "http://purl.obolibrary.org/obo/TAXRANK_0000007",
+    "order": "http://purl.obolibrary.org/obo/TAXRANK_0000003",
+    "suborder": "http://purl.obolibrary.org/obo/TAXRANK_0000014",
+    "family": "http://purl.obolibrary.org/obo/TAXRANK_0000004",
+    "subfamily": "http://purl.obolibrary.org/obo/TAXRANK_0000024",
+    "genus": "http://purl.obolibrary.org/obo/TAXRANK_0000005",
+    "subgenus": "http://purl.obolibrary.org/obo/TAXRANK_0000009",
+    "species": "http://purl.obolibrary.org/obo/TAXRANK_0000006",
+}
+
+# multi-valued isolate columns -> property and prefix of their values, and
+# their kind of name in the resolver index
+ISOLATE_VALUES = {
+    'isolate_names': (RDFS.label, '', 'isolate'),
+    'isolate_abbrevs': (SYNONYM, '', 'isolate_synonym'),
+    'genbank_accessions': (SKOS.exactMatch, 'genbank:', 'genbank'),
+    'refseq_accessions': (SKOS.exactMatch, 'refseq:', 'refseq'),
+}
+
+# N-Triples parser and Turtle serializer of the rdflib stores that have
+# their own, much faster than rdflib's (see --store). Oxigraph also returns
+# plain literals as xsd:string, which rdflib's serializer would spell out.
+NATIVE_FORMATS = {
+    'oxigraph': ('ox-nt', 'ox-turtle'),
+}
+
+# rdflib stores that only live in memory, for which --store-path is refused
+MEMORY_STORES = {'default', 'memory', 'simplememory'}
+
+# written next to a --store-path (as <path>.ictv-store) when the store is
+# created, marking it as safe to remove on the next build
+STORE_MARKER = '.ictv-store'
+
+# characters escaped in N-Triples literals, in the order rdflib escapes them
+NT_ESCAPES = [('\\', '\\\\'), ('\n', '\\n'), ('"', '\\"'), ('\r', '\\r')]
+
 
 ontology_iri = f'http://ictv.global/'
 
@@ -43,121 +109,229 @@ ontology_iri = f'http://ictv.global/'
 # All ictv_ids are taxnode_ids but not all taxnode_ids are ictv_ids
 # 
 
-def main():
+# Parsed and indexed ICTV inputs, loaded once by the parent process and
+# handed to the build workers (see load_inputs and init_worker)
+inputs = None
+
+# cProfile profiler of the running stage, if profiling (see --profile-dir)
+active_profiler = None
+
+def main(args):
+
+    # Wall/CPU time, peak RSS, rows and triples of every stage and release
+    report = {'stages': [], 'releases': [], 'triples': 0}
+    build_start = time.perf_counter()
+
+    with stage(report, 'Loading ICTV data', args.profile_dir) as record:
+        common_graph = rdflib.Graph()
+        common_graph.parse('imported_terms.ttl', format='ttl')
 
-    common_graph = rdflib.Graph()
-    common_graph.parse('imported_terms.ttl', format='ttl')
-    
-    nodes = pd.read_csv('data/taxonomy_node_export.utf8.txt', sep='\t', on_bad_lines=lambda x: x[:-1], engine='python', dtype=str)
+        shared = load_inputs(args.cache_dir and os.path.join(args.cache_dir, 'inputs'))
+        nodes = shared['nodes']
+        record['rows'] = len(nodes) + len(shared['delta']) + len(shared['isolates'])
 
     releases = nodes[(nodes['level_id'] == '100') & (nodes['name'] != 'empty_tree')]
 
     # for testing pretend there are only latest 3 releases
     # releases = releases.sort_values(by='msl_release_num', ascending=False).head(3)
 
-
-    taxnode_id_to_ictv_id = {}
-    for node in nodes.itertuples():
-        if node.taxnode_id in taxnode_id_to_ictv_id:
-            raise Exception(f'Taxnode ID {node.ictv_id} already exists')
-        taxnode_id_to_ictv_id[node.taxnode_id] = node.ictv_id
-
     latest_release = str(releases['msl_release_num'].astype(int).max())
 
     print(f'Latest release: MSL{latest_release}')
 
-    ontologies = []
-
-    with ProcessPoolExecutor() as executor:
-        futures = [
-            executor.submit(build_ontology_for_release, release.to_dict())
-            for _, release in releases.iterrows()
-        ]
-        ontologies = []
-        for future in as_completed(futures):
-            rdfxml = future.result()
-            g = rdflib.Graph()
-            g.parse(data=rdfxml, format="xml")
-            ontologies.append(g)
-
-    print(f'Built {len(ontologies)} ontologies, merging into one graph ...')
-
-    g_all = rdflib.Graph()
-    for g in ontologies:
-        g_all += g
-
-    print('Marking deprecated terms ...')
-
-    # For all classes that aren't deprecated yet
-    # If they are not from the latest ICTV version mark them as deprecated
-    for c in g_all.subjects(predicate=RDF.type, object=OWL.Class):
-        version = g_all.value(subject=c, predicate=OWL.versionInfo)
-        if version and str(version) != 'MSL'+latest_release:
-            g_all.add((c, OWL.deprecated, Literal(True)))
-
-    print('Annotating terms with their final replacement(s) ...')
-
-    for cl in g_all.subjects(predicate=RDF.type, object=OWL.Class):
-        working_set = set([cl])
-        while True:
-            new_set = set()
-            for c in working_set:
-                replacements = list(g_all.objects(subject=c, predicate=URIRef(HAD_REVISION)))
-                if len(replacements) > 0:
-                    new_set.update(replacements)
+    # The merged ontology is either loaded into an rdflib graph and written
+    # as pretty-printed Turtle, or, with --streaming, written out triple by
+    # triple as N-Triples (which is also valid Turtle) without ever holding
+    # the whole graph in memory. Both get the same triples. The graph can
+    # be backed by another rdflib store than the in-memory one (--store).
+    if args.streaming:
+        output = open('out/ictv_all_versions.owl.ttl', 'w', encoding='utf-8')
+        write = output.write
+    else:
+        g_all = open_graph(args.store, args.store_path)
+        nt_format, ttl_format = NATIVE_FORMATS.get(args.store.lower(), ('nt', 'ttl'))
+        write = lambda nt: g_all.parse(data=nt, format=nt_format)
+
+    def emit(nt):
+        report['triples'] += nt.count('\n')
+        write(nt)
+
+    # What the post-processing passes need to know about every class, as
+    # N-Triples terms collected from the triples of each release
+    index = {
+        'identifier': {},
+        'version': {},
+        'label': {},
+        'synonyms': {},
+        'revisions': {},
+    }
+    latest_version = Literal('MSL' + latest_release).n3()
+
+    built = 0
+    reused = 0
+
+    with stage(report, 'Building, merging and marking deprecated terms', args.profile_dir) as record:
+
+        # Releases whose inputs did not change since a previous run are loaded
+        # from the build cache, only the others are rebuilt
+        to_build = []
+        version = build_version()
+        for _, release in releases.iterrows():
+            release = release.to_dict()
+            record['rows'] += len(shared['nodes_by_release'].get(release['msl_release_num'], ()))
+            cache_file = None
+            if args.cache_dir:
+                cache_file = os.path.join(args.cache_dir, f"MSL{release['msl_release_num']}-{release_fingerprint(release, shared, version)}.nt")
+                if os.path.exists(cache_file):
+                    with open(cache_file, encoding='utf-8') as f:
+                        nt = f.read()
+                    write_release_file('MSL' + release['msl_release_num'], nt, args.compress)
+                    emit(nt)
+                    emit(index_release(index, nt, latest_version))
+                    reused += 1
+                    continue
+            to_build.append((release, cache_file))
+
+        if reused:
+            print(f'Reused {reused} cached ontologies')
+
+        # Workers write their release to its own ontology file in out/, which is
+        # merged as soon as it is written while the remaining releases are still
+        # being built. Releases are dispatched largest first and the largest
+        # ones are split into parts built in parallel (see schedule_releases),
+        # so that no big release is left running alone at the end.
+        workers = args.workers or os.cpu_count()
+        parts = {}
+        with ProcessPoolExecutor(max_workers=workers, mp_context=worker_context(), initializer=init_worker, initargs=(shared,)) as executor:
+            futures = {}
+            for release, cache_file, part, n_parts in schedule_releases(to_build, shared, workers, args.chunk_size):
+                if part is None:
+                    future = executor.submit(build_ontology_for_release, release, args.compress, args.profile_dir)
                 else:
-                    new_set.add(c)
-            if new_set == working_set:
-                break
-            working_set = new_set
-        if working_set != set([cl]):
-            for c in working_set:
-                g_all.add((cl, URIRef(TERM_REPLACED_BY), c))
-
-    print('Annotating former names ...')
-
-    for cl in g_all.subjects(predicate=RDF.type, object=OWL.Class):
-        cur_name = g_all.value(subject=cl, predicate=RDFS.label)
-        other_versions = list(g_all.subjects(predicate=URIRef(IDENTIFIER), object=g_all.value(subject=cl, predicate=URIRef(IDENTIFIER))))
-        for other_term in other_versions:
-            other_version = str(g_all.value(subject=other_term, predicate=OWL.versionInfo))
-            # if older version
-            if other_version and int(other_version.split('MSL')[1]) < int(str(g_all.value(subject=cl, predicate=OWL.versionInfo)).split('MSL')[1]):
-                older_name = g_all.value(subject=other_term, predicate=RDFS.label)
-                if older_name and older_name != cur_name:
-                    if len(list(g_all.triples((cl, URIRef(SYNONYM), Literal(older_name))))) == 0:
-                        g_all.add((cl, URIRef(SYNONYM), Literal(older_name)))
-                        stmt = BNode()
-                        g_all.add((stmt, RDF.type, OWL.Axiom))
-                        g_all.add((stmt, OWL.annotatedSource, cl))
-                        g_all.add((stmt, OWL.annotatedProperty, URIRef(SYNONYM)))
-                        g_all.add((stmt, OWL.annotatedTarget, Literal(older_name)))
-                        g_all.add((stmt, URIRef(SYNONYM_TYPE), URIRef(PREVIOUS_NAME)))
-                        g_all.add((stmt, OWL.versionInfo, Literal(other_version)))
-        
-
-    print('Building the final output ontology ...')
-
-    g_all += common_graph
-
-    g_all.add((URIRef(ontology_iri), RDF.type, OWL.Ontology))
-    g_all.add((URIRef(ontology_iri), RDFS.label, Literal("ICTV Taxonomy")))
-    g_all.add((URIRef(ontology_iri), RDFS.comment, Literal("International Committee on Taxonomy of Viruses (ICTV)")))
-    g_all.add((URIRef(ontology_iri), FOAF.homepage, URIRef("http://ictv.global/")))
-    g_all.add((URIRef(ontology_iri), OWL.versionInfo, Literal("MSL"+latest_release)))
-    g_all.add((URIRef(ontology_iri), URIRef('http://purl.obolibrary.org/obo/IAO_0000700'), URIRef('http://purl.obolibrary.org/obo/NCBITaxon_10239')))
-
-    g_all.bind('owl', OWL)
-    g_all.bind('iao', 'http://purl.obolibrary.org/obo/IAO_')
-    g_all.bind('oio', 'http://www.geneontology.org/formats/oboInOwl#')
-    g_all.bind('omo', 'http://purl.obolibrary.org/obo/OMO_')
-    g_all.bind('dcterms', 'http://purl.org/dc/terms/')
-    g_all.bind('rdfs', RDFS)
-    g_all.bind('taxrank', 'http://purl.obolibrary.org/obo/TAXRANK_')
-    g_all.bind('prov', 'http://www.w3.org/ns/prov#')
-    g_all.serialize('out/ictv_all_versions.owl.ttl', format="ttl")
-
-    owl_files = [f for f in os.listdir('out') if f.startswith('MSL') and f.endswith('.owl.ttl')]
+                    future = executor.submit(build_release_part, release, *part, args.profile_dir)
+                futures[future] = (release, cache_file, part, n_parts)
+
+            for future in as_completed(futures):
+                release, cache_file, part, n_parts = futures[future]
+                if part is None:
+                    path, release_stats = future.result()
+                    nt = read_release_file(path)
+                else:
+                    release_parts = parts.setdefault(release['msl_release_num'], {})
+                    release_parts[part] = future.result()
+                    if len(release_parts) < n_parts:
+                        continue
+                    nt, release_stats = merge_release_parts(release, [release_parts[p] for p in sorted(release_parts)], args.compress)
+                report['releases'].append(release_stats)
+                if cache_file:
+                    store_in_cache(cache_file, nt)
+                emit(nt)
+                emit(index_release(index, nt, latest_version))
+                built += 1
+
+        print(f'Built {built} ontologies and merged them into one')
+
+    with stage(report, 'Annotating terms with their final replacement(s)', args.profile_dir) as record:
+        revisions = index['revisions']
+        final_replacements = revision_closure(revisions)
+        record['rows'] = len(revisions)
+
+        lines = []
+        for cl in revisions:
+            for c in final_replacements[cl]:
+                lines.append(f'{cl} <{TERM_REPLACED_BY}> {c} .\n')
+        emit(''.join(lines))
+
+    with stage(report, 'Annotating former names', args.profile_dir) as record:
+        record['rows'] = len(index['identifier'])
+
+        lines = []
+        axioms = 0
+        for versions in index_versions(index).values():
+            # names used by the versions older than the current one, with the
+            # first version that used each of them
+            older_names = {}
+            for _, same_release in groupby(versions, key=lambda v: v[0]):
+                same_release = list(same_release)
+                for _, cl, cur_name, _ in same_release:
+                    synonyms = index['synonyms'].setdefault(cl, set())
+                    for older_name, other_version in older_names.items():
+                        if older_name != cur_name and older_name not in synonyms:
+                            synonyms.add(older_name)
+                            axioms += 1
+                            stmt = f'_:previousname{axioms}'
+                            lines.append(f'{cl} <{SYNONYM}> {older_name} .\n')
+                            lines.append(f'{stmt} <{RDF.type}> <{OWL.Axiom}> .\n')
+                            lines.append(f'{stmt} <{OWL.annotatedSource}> {cl} .\n')
+                            lines.append(f'{stmt} <{OWL.annotatedProperty}> <{SYNONYM}> .\n')
+                            lines.append(f'{stmt} <{OWL.annotatedTarget}> {older_name} .\n')
+                            lines.append(f'{stmt} <{SYNONYM_TYPE}> <{PREVIOUS_NAME}> .\n')
+                            lines.append(f'{stmt} <{OWL.versionInfo}> {other_version} .\n')
+                for _, _, name, version in same_release:
+                    if name:
+                        older_names.setdefault(name, version)
+        emit(''.join(lines))
+
+    if args.resolver:
+        with stage(report, 'Writing the resolver index', args.profile_dir) as record:
+            record['rows'] = write_resolver(args.resolver, shared, releases, latest_release, {cl: final_replacements[cl] for cl in revisions})
+
+    if args.lineage:
+        with stage(report, 'Writing the lineage index', args.profile_dir) as record:
+            record['rows'] = write_lineage(args.lineage, shared, releases)
+
+    with stage(report, 'Building the final output ontology', args.profile_dir):
+        emit(common_graph.serialize(format='nt'))
+        emit(ontology_header(ontology_iri, "ICTV Taxonomy", 'MSL' + latest_release).serialize(format='nt'))
+
+        if args.streaming:
+            output.close()
+        elif not args.canonical:
+            g_all.bind('owl', OWL)
+            g_all.bind('iao', 'http://purl.obolibrary.org/obo/IAO_')
+            g_all.bind('oio', 'http://www.geneontology.org/formats/oboInOwl#')
+            g_all.bind('omo', 'http://purl.obolibrary.org/obo/OMO_')
+            g_all.bind('dcterms', 'http://purl.org/dc/terms/')
+            g_all.bind('rdfs', RDFS)
+            g_all.bind('taxrank', 'http://purl.obolibrary.org/obo/TAXRANK_')
+            g_all.bind('prov', 'http://www.w3.org/ns/prov#')
+            g_all.bind('skos', SKOS)
+            g_all.bind('foaf', FOAF)
+            g_all.serialize('out/ictv_all_versions.owl.ttl', format=ttl_format)
+
+    # This build in canonical form (see ictv_canonical), for --canonical and
+    # --previous
+    current = None
+    if args.canonical or args.previous:
+        with stage(report, 'Canonicalizing the output ontology', args.profile_dir) as record:
+            if args.streaming:
+                current = ictv_canonical.canonical_lines(ictv_canonical.read_graph('out/ictv_all_versions.owl.ttl', format='nt'))
+            else:
+                current = ictv_canonical.canonical_lines(g_all)
+            record['rows'] = len(current)
+
+            # sorted N-Triples, which is also valid Turtle
+            if args.canonical:
+                with open('out/ictv_all_versions.owl.ttl', 'w', encoding='utf-8') as f:
+                    f.writelines(sorted(current))
+
+    if args.previous:
+        # Patch from the previous build to this one, both in canonical form
+        # so that the blank nodes of the former name axioms compare equal
+        with stage(report, 'Writing the patch against the previous build', args.profile_dir) as record:
+            previous = ictv_canonical.canonical_lines(ictv_canonical.read_graph(args.previous))
+            record['rows'] = len(previous)
+            added, removed = ictv_canonical.write_patch(args.patch, previous, current)
+            report['patch'] = {'added': added, 'removed': removed}
+            print(f'{added} triples added and {removed} removed since {args.previous}, written to {args.patch}')
+
+    if not args.streaming:
+        g_all.close()
+
+    owl_files = sorted(f for f in os.listdir('out') if f.startswith('MSL') and f.endswith(('.owl.ttl', '.owl.ttl.gz')))
+
+    if args.canonical:
+        write_manifest('out/manifest.json', owl_files, len(current), shared, build_version())
     ols_config = {
         'ontologies': json.load(open('supporting_ontologies.json'))['ontologies'] + list(map(lambda f: {
             'id': f.split('.')[0],
@@ -181,125 +355,844 @@ def main():
     with open('ols_config_combined.json', 'w') as f:
         f.write(json.dumps(ols_config_combined, indent=2))
 
+    if args.report:
+        report['latest_release'] = 'MSL' + latest_release
+        report['wall_s'] = time.perf_counter() - build_start
+        report['cpu_s'] = cpu_time()
+        report['peak_rss_mb'] = peak_rss_mb()
+        with open(args.report, 'w') as f:
+            f.write(json.dumps(report, indent=2))
 
-def build_ontology_for_release(release):
 
-    print(f'Creating ontology for ICTV release {release['name']}')
+@contextmanager
+def stage(report, name, profile_dir=None):
+    # Announce a build stage and record its wall time, CPU time (including
+    # the worker processes that finished during the stage), peak RSS so far
+    # and the triples emitted meanwhile. The stage sets record['rows'].
 
-    nodes = pd.read_csv('data/taxonomy_node_export.utf8.txt', sep='\t', on_bad_lines=lambda x: x[:-1], engine='python', dtype=str)
-    delta = pd.read_csv('data/taxonomy_node_delta.utf8.txt', sep='\t', dtype=str)
-    isolates = pd.read_csv('data/species_isolates.utf8.txt', sep='\t', dtype=str)
+    print(f'{name} ...')
+    record = {'stage': name, 'rows': 0}
+    triples = report['triples']
+    profiler = start_profiler(profile_dir)
+    wall = time.perf_counter()
+    cpu = cpu_time()
+    try:
+        yield record
+    finally:
+        record['wall_s'] = time.perf_counter() - wall
+        record['cpu_s'] = cpu_time() - cpu
+        record['peak_rss_mb'] = peak_rss_mb()
+        record['triples'] = report['triples'] - triples
+        stop_profiler(profiler, profile_dir, name)
+        report['stages'].append(record)
 
-    taxnode_id_to_ictv_id = {}
-    for node in nodes.itertuples():
-        if node.taxnode_id in taxnode_id_to_ictv_id:
-            raise Exception(f'Taxnode ID {node.ictv_id} already exists')
-        taxnode_id_to_ictv_id[node.taxnode_id] = node.ictv_id
 
-    msl_id = 'MSL' + release['msl_release_num']
+def cpu_time():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    unit = 1 if sys.platform == 'darwin' else 1024
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * unit / 2**20
 
-    nodes_in_release = nodes[(nodes['msl_release_num'] == release['msl_release_num']) & (nodes['level_id'] != '100')]
 
-    g = rdflib.Graph()
+def reset_peak_rss():
+    # Reset the peak RSS of this process to its current RSS, so that a
+    # worker reports the peak of each release instead of the peak of all the
+    # releases it built so far. Linux only: returns False elsewhere.
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
 
-    for node in nodes_in_release.itertuples():
-        class_iri = URIRef(f'http://ictv.global/id/{msl_id}/ICTV{node.ictv_id}')
 
-        replacements = delta[delta['prev_taxid'] == node.taxnode_id]
+def release_peak_rss_mb(reset):
+    # Peak RSS since reset_peak_rss(), None if it could not be reset
+    if not reset:
+        return None
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) * 1024 / 2**20
+    return None
 
-        if not replacements.empty:
-            is_merged = replacements['is_merged'].value_counts().get('1', 0) > 0
-            is_split = replacements['is_split'].value_counts().get('1', 0) > 0
-            is_moved = replacements['is_moved'].value_counts().get('1', 0) > 0
-            is_promoted = replacements['is_promoted'].value_counts().get('1', 0) > 0
-            is_demoted = replacements['is_demoted'].value_counts().get('1', 0) > 0
-            is_renamed = replacements['is_renamed'].value_counts().get('1', 0) > 0
-            is_new = replacements['is_new'].value_counts().get('1', 0) > 0
-            is_deleted = replacements['is_deleted'].value_counts().get('1', 0) > 0
 
-            # an ancestor changed but I didn't necessarily change
-            is_lineage_updated = replacements['is_lineage_updated'].value_counts().get('1', 0) > 0
+def start_profiler(profile_dir):
+    global active_profiler
+    if not profile_dir:
+        return None
+    active_profiler = cProfile.Profile()
+    active_profiler.enable()
+    return active_profiler
 
-            replacement_iris = []
 
-            for replacement in replacements.itertuples():
-                if pd.isna(replacement.new_taxid):
+def stop_profiler(profiler, profile_dir, name):
+    # One cProfile dump per stage, e.g. for snakeviz or flameprof
+    global active_profiler
+    if profiler:
+        profiler.disable()
+        active_profiler = None
+        os.makedirs(profile_dir, exist_ok=True)
+        profiler.dump_stats(os.path.join(profile_dir, re.sub(r'\W+', '_', name.lower()).strip('_') + '.prof'))
+
+
+def revision_closure(revisions):
+    # Map every term to its final replacement(s): the terms without any
+    # revision that are reached by following the revision links. `revisions`
+    # maps each revised term to its direct revisions. Each term is resolved
+    # once, in topological order (depth-first post-order), so the cost is
+    # linear in the size of the revision graph. A revision link that closes a
+    # cycle is reported and ignored.
+
+    final = {}
+    for root in revisions:
+        if root in final:
+            continue
+        path = [root]
+        on_path = {root}
+        stack = [iter(revisions[root])]
+        while stack:
+            for c in stack[-1]:
+                if c in final:
                     continue
-                if replacement.new_taxid in taxnode_id_to_ictv_id:
-                    replacement_iris.append(f'http://ictv.global/id/MSL{replacement.msl}/ICTV'+taxnode_id_to_ictv_id[replacement.new_taxid])
-                else:
-                    print('Warning: replacement taxid ' + replacement.new_taxid + ' not found in release ' + replacement.msl)
-                    replacement_iris.append(f'http://ictv.global/id/MSL{replacement.msl}/ICTV'+replacement.new_taxid)
-
-            for replacement_iri in replacement_iris:
-                g.add((class_iri, URIRef(HAD_REVISION), URIRef(replacement_iri)))
-                g.add((URIRef(replacement_iri), URIRef(WAS_REVISION_OF), class_iri))
-
-            if is_new:
-                year = replacements['new_taxid'][:4]
-                g.add((class_iri, URIRef(EDITOR_NOTE), Literal(f"New in " + year)))
-            elif is_merged:
-                g.add((class_iri, URIRef(EDITOR_NOTE), Literal(f"Merged into {', '.join(replacement_iris)}")))
-                g.add((class_iri, URIRef(OBSOLESCENCE_REASON), URIRef(TERMS_MERGED)))
-            elif is_split:
-                g.add((class_iri, URIRef(EDITOR_NOTE), Literal(f"Split into {', '.join(replacement_iris)}")))
-                g.add((class_iri, URIRef(OBSOLESCENCE_REASON), URIRef(TERM_SPLIT)))
-            elif is_moved:
-                g.add((class_iri, URIRef(EDITOR_NOTE), Literal(f"Moved to {', '.join(replacement_iris)}")))
-            elif is_promoted:
-                g.add((class_iri, URIRef(EDITOR_NOTE), Literal(f"Promoted, see {', '.join(replacement_iris)}")))
-            elif is_demoted:
-                g.add((class_iri, URIRef(EDITOR_NOTE), Literal(f"Demoted, see {', '.join(replacement_iris)}")))
-            elif is_renamed:
-                g.add((class_iri, URIRef(EDITOR_NOTE), Literal(f"Renamed, see {', '.join(replacement_iris)}")))
-            elif is_deleted:
-                g.add((class_iri, URIRef(EDITOR_NOTE), Literal(f"Deleted")))
-
-        g.add((class_iri, RDF.type, OWL.Class))
-        g.add((class_iri, RDFS.label, Literal(node.name)))
-        g.add((class_iri, URIRef(IDENTIFIER), Literal("ICTV" + node.ictv_id)))
-        g.add((class_iri, OWL.versionInfo, Literal(str(msl_id))))
-        g.add((class_iri, URIRef(RANK), URIRef(map_rank(node.rank))))
-
-        if node.parent_id == release['taxnode_id']:
-            # "Viruses" from NCBITaxon used as the root for the ontology
-            g.add((class_iri, RDFS.subClassOf, URIRef('http://purl.obolibrary.org/obo/NCBITaxon_10239')))
+                if c in on_path:
+                    print(f'Warning: revision cycle {' -> '.join(path[path.index(c):] + [c])}, ignoring link {path[-1]} -> {c}')
+                    continue
+                if c not in revisions:
+                    final[c] = frozenset([c])
+                    continue
+                path.append(c)
+                on_path.add(c)
+                stack.append(iter(revisions[c]))
+                break
+            else:
+                stack.pop()
+                c = path.pop()
+                on_path.discard(c)
+                final[c] = frozenset().union(*(final.get(r, ()) for r in revisions[c]))
+    return final
+
+
+def index_release(index, nt, latest_version):
+    # Add the classes found in the N-Triples of one release to the index used
+    # by the post-processing passes. Returns the N-Triples marking every class
+    # that is not from the latest ICTV version as deprecated.
+
+    identifiers = {}
+    versions = {}
+    labels = {}
+    synonyms = {}
+    for line in nt.splitlines():
+        if not line:
+            continue
+        s, p, o = line[:-2].split(' ', 2)
+        if p == f'<{IDENTIFIER}>':
+            identifiers[s] = o
+        elif p == f'<{OWL.versionInfo}>':
+            versions[s] = o
+        elif p == f'<{RDFS.label}>':
+            labels[s] = o
+        elif p == f'<{SYNONYM}>':
+            synonyms.setdefault(s, set()).add(o)
+        elif p == f'<{HAD_REVISION}>':
+            index['revisions'].setdefault(s, []).append(o)
+
+    # isolates have labels and synonyms too, only classes have an identifier
+    for c, identifier in identifiers.items():
+        index['identifier'][c] = identifier
+        index['version'][c] = versions.get(c)
+        if c in labels:
+            index['label'][c] = labels[c]
+        if c in synonyms:
+            index['synonyms'][c] = synonyms[c]
+
+    return ''.join(
+        f'{c} <{OWL.deprecated}> {Literal(True).n3()} .\n'
+        for c, version in versions.items()
+        if version != latest_version
+    )
+
+
+def taxon_lineages(taxa):
+    # Ancestors of every taxon, from the top of its release tree down to its
+    # parent: taxnode_id -> [taxnode_id]. Each lineage is computed once, from
+    # that of the parent, in a single pass over the trees. The release (tree)
+    # nodes themselves are not part of the taxa, so they end each lineage.
+
+    taxnode_ids = taxa['taxnode_id'].tolist()
+    parents = dict(zip(taxnode_ids, taxa['parent_id'].tolist()))
+
+    lineages = {}
+    for taxnode_id in parents:
+        # walk up to the first taxon with a known lineage, then fill in the
+        # lineages back down
+        chain = []
+        in_chain = set()
+        t = taxnode_id
+        while t not in lineages:
+            chain.append(t)
+            in_chain.add(t)
+            parent = parents[t]
+            if parent not in parents or parent in in_chain:
+                lineages[chain.pop()] = []
+                break
+            t = parent
+        for t in reversed(chain):
+            parent = parents[t]
+            lineages[t] = lineages[parent] + [parent]
+    return lineages
+
+
+def release_taxa(shared, releases):
+    # The taxa of the given releases, in one table (None if there are none)
+    nodes_by_release = shared['nodes_by_release']
+    release_nums = [msl for msl in releases['msl_release_num'] if msl in nodes_by_release]
+    if not release_nums:
+        return None
+    return pd.concat([nodes_by_release[msl] for msl in release_nums])
+
+
+def write_lineage(path, shared, releases):
+    # Write the lineage of every class of the given releases as JSON lines
+    # {"iri", "lineage", "ancestors_iris"}: the labels and IRIs of its
+    # ancestors, top first, as enrichLineage of the ICTV API helpers
+    # reconstructs them from OLS. That is, the ancestors in the same release
+    # under the NCBITaxon "Viruses" root, which the top taxa of every release
+    # are subclasses of. Returns the number of classes.
+
+    taxa = release_taxa(shared, releases)
+    if taxa is None:
+        return 0
+
+    taxnode_ids = taxa['taxnode_id'].tolist()
+    parents = dict(zip(taxnode_ids, taxa['parent_id'].tolist()))
+    iris = dict(zip(taxnode_ids, ('http://ictv.global/id/MSL' + taxa['msl_release_num'] + '/ICTV' + taxa['ictv_id']).tolist()))
+    labels = dict(zip(taxnode_ids, or_none(taxa['name'])))
+    lineages = taxon_lineages(taxa)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        for t in taxnode_ids:
+            # like enrichLineage, skip unnamed ancestors
+            ancestors = [a for a in lineages[t] if labels[a]]
+            lineage = [labels[a] for a in ancestors]
+            ancestors_iris = [iris[a] for a in ancestors]
+            # the top taxon is a child of the release node, i.e. of Viruses
+            top = lineages[t][0] if lineages[t] else t
+            if parents[top] not in parents:
+                lineage.insert(0, 'Viruses')
+                ancestors_iris.insert(0, 'http://purl.obolibrary.org/obo/NCBITaxon_10239')
+            f.write(json.dumps({
+                'iri': iris[t],
+                'lineage': lineage,
+                'ancestors_iris': ancestors_iris,
+            }) + '\n')
+    return len(taxnode_ids)
+
+
+def write_resolver(path, shared, releases, latest_release, final_replacements):
+    # Write the offline resolution index (see ictv_resolver) of the classes
+    # of the given releases, with the final replacements of every revised
+    # class. Returns the number of classes.
+
+    taxa = release_taxa(shared, releases)
+    if taxa is None:
+        return 0
+
+    class_iris = 'http://ictv.global/id/MSL' + taxa['msl_release_num'] + '/ICTV' + taxa['ictv_id']
+    taxnode_ids = taxa['taxnode_id'].tolist()
+    iri_by_taxnode_id = dict(zip(taxnode_ids, class_iris.tolist()))
+    ictv_ids = dict(zip(taxnode_ids, taxa['ictv_id'].tolist()))
+    lineages = taxon_lineages(taxa)
+
+    reasons = []
+    for taxnode_id in taxnode_ids:
+        flags = shared['change_flags_by_prev_taxid'].get(taxnode_id) if taxnode_id in shared['replacements_by_prev_taxid'] else None
+        if flags is None or flags.is_new:
+            reasons.append(None)
+        elif flags.is_merged:
+            reasons.append('MERGED')
+        elif flags.is_split:
+            reasons.append('SPLIT')
         else:
-            if node.parent_id in taxnode_id_to_ictv_id:
-                g.add((class_iri, RDFS.subClassOf, URIRef(f'http://ictv.global/id/{msl_id}/ICTV{taxnode_id_to_ictv_id[node.parent_id]}')))
-        g.add((class_iri, RDFS.isDefinedBy, URIRef(ontology_iri)))
-
-        if not pd.isna(node.abbrev_csv):
-            g.add((class_iri, URIRef(SYNONYM), Literal(node.abbrev_csv)))
-
-        # if not pd.isna(node.genbank_accession_csv):
-        #     add_xrefs(g, class_iri, node.genbank_accession_csv, 'genbank:')
-        # if not pd.isna(node.refseq_accession_csv):
-        #     add_xrefs(g, class_iri, node.refseq_accession_csv, 'refseq:')
-
-        taxnode_isolates = isolates[isolates['taxnode_id'] == node.taxnode_id]
-
-        for isolate in taxnode_isolates.itertuples():
-            isolate_iri = f'http://ictv.global/id/VMR{isolate.isolate_id}'
-            g.add((URIRef(isolate_iri), RDF.type, OWL.NamedIndividual))
-            g.add((URIRef(isolate_iri), RDF.type, class_iri))
-            g.add((URIRef(isolate_iri), RDFS.isDefinedBy, URIRef(ontology_iri)))
-            if not pd.isna(isolate.isolate_names):
-                for name in re.split(';|,', isolate.isolate_names):
-                    g.add((URIRef(isolate_iri), RDFS.label, Literal(name.strip())))
-            if not pd.isna(isolate.isolate_abbrevs):
-                for abbrev in re.split(';|,', isolate.isolate_abbrevs):
-                    g.add((URIRef(isolate_iri), URIRef(SYNONYM), Literal(abbrev.strip())))
-            if not pd.isna(isolate.genbank_accessions):
-                for xref in re.split(';|,', isolate.genbank_accessions):
-                    g.add((URIRef(isolate_iri), SKOS.exactMatch, Literal("genbank:" + xref.strip())))
-                    g.add((class_iri, SKOS.narrowMatch, Literal("genbank:" + xref.strip())))
-            if not pd.isna(isolate.refseq_accessions):
-                for xref in re.split(';|,', isolate.refseq_accessions):
-                    g.add((URIRef(isolate_iri), SKOS.exactMatch, Literal("refseq:" + xref.strip())))
-                    g.add((class_iri, SKOS.narrowMatch, Literal("refseq:" + xref.strip())))
-
-    return g.serialize(format='xml')
+            reasons.append(None)
+
+    classes = zip(
+        class_iris.tolist(),
+        ('ICTV' + taxa['ictv_id']).tolist(),
+        taxa['msl_release_num'].astype(int).tolist(),
+        or_none(taxa['name']),
+        or_none(taxa['rank']),
+        [iri_by_taxnode_id.get(parent_id) for parent_id in taxa['parent_id'].tolist()],
+        [json.dumps(['ICTV' + ictv_ids[a] for a in lineages[t]]) for t in taxnode_ids],
+        (taxa['msl_release_num'] != latest_release).tolist(),
+        reasons,
+    )
+
+    names = [
+        name_rows(taxa['name'], 'label', class_iris),
+        name_rows(taxa['abbrev_csv'], 'synonym', class_iris),
+        name_rows('ICTV' + taxa['ictv_id'], 'identifier', class_iris),
+    ]
+    isolate_values = [shared['isolate_values_by_release'][msl] for msl in releases['msl_release_num'] if msl in shared['isolate_values_by_release']]
+    if isolate_values:
+        values = pd.concat(isolate_values)
+        names.append(zip(
+            values['text'].tolist(),
+            values['kind'].tolist(),
+            ('http://ictv.global/id/MSL' + values['msl_release_num'] + '/ICTV' + values['ictv_id']).tolist(),
+        ))
+        # accessions of segments are labelled, e.g. 'DNA-A: AB123456': index
+        # the bare accession too, as add_xrefs separates the two
+        segments = values[values['kind'].isin(['genbank', 'refseq']) & values['text'].str.contains(':', regex=False)]
+        names.append(zip(
+            segments['text'].str.split(':').str[1].str.strip().tolist(),
+            segments['kind'].tolist(),
+            ('http://ictv.global/id/MSL' + segments['msl_release_num'] + '/ICTV' + segments['ictv_id']).tolist(),
+        ))
+
+    replacements = ((cl[1:-1], c[1:-1]) for cl, cs in final_replacements.items() for c in cs)
+
+    ictv_resolver.write_resolver_index(path, classes, (row for rows in names for row in rows), replacements, {
+        'ontology_iri': ontology_iri,
+        'latest_release': 'MSL' + latest_release,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    })
+    return len(taxa)
+
+
+def name_rows(names, kind, iris):
+    # (name, kind, iri) of the non-missing names
+    present = names.notna()
+    return zip(names[present].tolist(), [kind] * int(present.sum()), iris[present].tolist())
+
+
+def or_none(values):
+    return [None if pd.isna(v) else v for v in values.tolist()]
+
+
+def index_versions(index):
+    # Group the versions of every taxon by dcterms:identifier:
+    # identifier -> [(MSL number, class, label, versionInfo)], sorted by MSL
+
+    versions_by_identifier = {}
+    for c, identifier in index['identifier'].items():
+        version = index['version'][c]
+        versions_by_identifier.setdefault(identifier, []).append((int(version.strip('"').split('MSL')[1]), c, index['label'].get(c), version))
+
+    for versions in versions_by_identifier.values():
+        versions.sort(key=lambda v: v[0])
+    return versions_by_identifier
+
+
+def load_inputs(cache_dir=None):
+    # Parse every ICTV input file exactly once per build, or load the parsed
+    # tables from cache_dir if the files did not change. The result is shared
+    # read-only with all build workers instead of each worker re-reading it.
+
+    nodes, delta, isolates = ictv_ingest.read_inputs(cache_dir)
+
+    duplicated = nodes['taxnode_id'][nodes['taxnode_id'].duplicated()]
+    if not duplicated.empty:
+        raise Exception(f'Taxnode ID {duplicated.iloc[0]} already exists')
+    taxnode_id_to_ictv_id = dict(zip(nodes['taxnode_id'], nodes['ictv_id']))
+    ictv_id_by_taxnode_id = pd.Series(nodes['ictv_id'].values, index=nodes['taxnode_id'])
+
+    # taxa of each release, without the release (tree) node itself
+    taxa = nodes[nodes['level_id'] != '100']
+    nodes_by_release = {msl: group for msl, group in taxa.groupby('msl_release_num', sort=False)}
+
+    # (new_taxid, msl) of every delta row, keyed by the taxnode it replaces
+    replacements_by_prev_taxid = {}
+    for prev_taxid, new_taxid, msl in zip(delta['prev_taxid'], delta['new_taxid'], delta['msl']):
+        if not pd.isna(prev_taxid):
+            replacements_by_prev_taxid.setdefault(prev_taxid, []).append((new_taxid, msl))
+
+    # whether any delta row of a taxnode has each change flag set
+    change_flags = (delta[CHANGE_FLAGS] == '1').groupby(delta['prev_taxid']).any()
+    change_flags_by_prev_taxid = dict(zip(change_flags.index, change_flags.itertuples(index=False)))
+
+    # isolates, their split names/abbreviations/accessions and the distinct
+    # accessions of each taxon, grouped by the release of their taxon
+    isolates_by_release, isolate_values_by_release, xrefs_by_release = (
+        {msl: group for msl, group in table.groupby('msl_release_num', sort=False)}
+        for table in explode_isolates(isolates, taxa)
+    )
+
+    return {
+        'nodes': nodes,
+        'nodes_by_release': nodes_by_release,
+        'delta': delta,
+        'replacements_by_prev_taxid': replacements_by_prev_taxid,
+        'change_flags_by_prev_taxid': change_flags_by_prev_taxid,
+        'isolates': isolates,
+        'isolates_by_release': isolates_by_release,
+        'isolate_values_by_release': isolate_values_by_release,
+        'xrefs_by_release': xrefs_by_release,
+        'taxnode_id_to_ictv_id': taxnode_id_to_ictv_id,
+        'ictv_id_by_taxnode_id': ictv_id_by_taxnode_id,
+    }
+
+
+def explode_isolates(isolates, taxa):
+    # Split the ';' or ',' separated values of all isolates once, instead of
+    # per isolate in every release build. Returns three tables, each with the
+    # release and ICTV ID of the taxon of the isolate:
+    # - the isolates themselves,
+    # - one row per isolate, property and (stripped, N-Triples) value, with
+    #   the stripped value as text and its kind in the resolver index,
+    # - one row per taxon and distinct accession, for its skos:narrowMatch.
+    # Isolates of taxnodes that are not a taxon of any release are dropped.
+
+    taxon_rows = pd.Series(range(len(taxa)), index=taxa['taxnode_id'])
+    rows = isolates['taxnode_id'].map(taxon_rows)
+    isolates = isolates[rows.notna()].assign(
+        msl_release_num=taxa['msl_release_num'].values[rows.dropna().astype(int)],
+        ictv_id=taxa['ictv_id'].values[rows.dropna().astype(int)],
+    )
+
+    values = []
+    for column, (prop, prefix, kind) in ISOLATE_VALUES.items():
+        split = isolates[column].dropna().str.split(r'[;,]', regex=True).explode().str.strip()
+        values.append(isolates.loc[split.index, ['msl_release_num', 'ictv_id', 'taxnode_id', 'isolate_id']].assign(
+            property=f'<{prop}>',
+            value=nt_literals(prefix + split),
+            text=split,
+            kind=kind,
+        ))
+    values = pd.concat(values, ignore_index=True)
+
+    xrefs = values[values['property'] == f'<{SKOS.exactMatch}>'].drop_duplicates(['taxnode_id', 'value'])
+
+    return isolates, values, xrefs[['msl_release_num', 'ictv_id', 'taxnode_id', 'value']]
+
+
+def build_version():
+    # The build scripts themselves are part of every cache key, so any change
+    # to how the ontology is generated invalidates all cached releases. The
+    # manifest records it too, so that a build with changed code (e.g. of
+    # the resolver index) is not mistaken for an unchanged one.
+    h = hashlib.sha256()
+    for path in [__file__, ictv_ingest.__file__, ictv_resolver.__file__, ictv_canonical.__file__]:
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def release_fingerprint(release, shared, version):
+    # Hash of everything build_ontology_for_release reads for this release:
+    # its taxa, the delta rows replacing them (with the ICTV IDs of their
+    # replacements) and their isolates
+
+    nodes_in_release = shared['nodes_by_release'].get(release['msl_release_num'], shared['nodes'].iloc[0:0])
+    taxnode_ids = nodes_in_release['taxnode_id']
+
+    delta = shared['delta']
+    delta_rows = delta[delta['prev_taxid'].isin(taxnode_ids)]
+    isolates = shared['isolates']
+    isolate_rows = isolates[isolates['taxnode_id'].isin(taxnode_ids)]
+
+    h = hashlib.sha256(version.encode())
+    h.update(json.dumps(release, sort_keys=True, default=str).encode())
+    for rows in (nodes_in_release, delta_rows, isolate_rows, delta_rows['new_taxid'].map(shared['taxnode_id_to_ictv_id'])):
+        h.update(pd.util.hash_pandas_object(rows, index=False).values.tobytes())
+    return h.hexdigest()[:16]
+
+
+def store_in_cache(cache_file, nt):
+    cache_dir, name = os.path.split(cache_file)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # drop the outdated entries of the same release
+    release_prefix = name.split('-')[0] + '-'
+    for f in os.listdir(cache_dir):
+        if f.startswith(release_prefix) and f != name:
+            os.remove(os.path.join(cache_dir, f))
+
+    tmp_file = cache_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(nt)
+    os.replace(tmp_file, cache_file)
+
+
+def worker_context():
+    # Prefer fork so the workers inherit the parsed inputs from the parent
+    # copy-on-write instead of receiving a pickled copy each
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def init_worker(shared):
+    global inputs
+    inputs = shared
+    # a forked worker inherits the profiler of the stage that started it
+    if active_profiler:
+        active_profiler.disable()
+
+
+def open_graph(store, store_path=None):
+    # rdflib graph of the merged ontology, backed by the given rdflib store
+    # plugin, e.g. Oxigraph (pip install oxrdflib). With store_path, the
+    # store is persisted there instead of held in memory. An earlier store
+    # at that path is removed first, so that it only has this build, but
+    # only if this script created it (see STORE_MARKER): any other existing
+    # file or non-empty directory is left alone and the build stops.
+
+    try:
+        g = rdflib.Graph(store=store, bind_namespaces='core')
+    except rdflib.plugin.PluginException:
+        raise Exception(f'Unknown rdflib store {store}, is its plugin installed?')
+
+    if store_path:
+        marker = store_path.rstrip('/' + os.sep) + STORE_MARKER
+        if os.path.isdir(store_path) and not os.listdir(store_path):
+            os.rmdir(store_path)
+        elif os.path.exists(store_path):
+            if not os.path.exists(marker):
+                raise Exception(f'--store-path {store_path} already exists and is not a store of an earlier build, not overwriting it')
+            if os.path.isdir(store_path):
+                shutil.rmtree(store_path)
+            else:
+                os.remove(store_path)
+        g.open(store_path, create=True)
+        with open(marker, 'w') as f:
+            f.write(f'{store} store of the merged ontology, written by create_ontologies.py\n')
+    return g
+
+
+def write_manifest(path, owl_files, triples, shared, version):
+    # SHA-256 of the canonical output ontology and of every release file in
+    # out/, so that a build can be compared with an earlier one without
+    # reading the ontologies (e.g. to skip publishing an unchanged build),
+    # and of the inputs it was built from
+
+    def file_sha256(f_name):
+        h = hashlib.sha256()
+        with open(f_name, 'rb') as f:
+            while block := f.read(1 << 20):
+                h.update(block)
+        return h.hexdigest()
+
+    manifest = {
+        'ictv_all_versions.owl.ttl': {
+            'sha256': file_sha256('out/ictv_all_versions.owl.ttl'),
+            'triples': triples,
+        },
+        'releases': {
+            f.split('.')[0]: {'file': f, 'sha256': file_sha256(os.path.join('out', f))}
+            for f in owl_files
+        },
+        'inputs': {
+            os.path.basename(f): file_sha256(f)
+            for f in [ictv_ingest.NODE_EXPORT, ictv_ingest.DELTA, ictv_ingest.ISOLATES]
+        } | {'build': version},
+    }
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def release_file_name(msl_id, compress):
+    return os.path.join('out', f'{msl_id}.owl.ttl' + ('.gz' if compress else ''))
+
+
+def ontology_header(iri, label, msl_id):
+    header = rdflib.Graph()
+    header.add((URIRef(iri), RDF.type, OWL.Ontology))
+    header.add((URIRef(iri), RDFS.label, Literal(label)))
+    header.add((URIRef(iri), RDFS.comment, Literal("International Committee on Taxonomy of Viruses (ICTV)")))
+    header.add((URIRef(iri), FOAF.homepage, URIRef("http://ictv.global/")))
+    header.add((URIRef(iri), OWL.versionInfo, Literal(msl_id)))
+    header.add((URIRef(iri), URIRef('http://purl.obolibrary.org/obo/IAO_0000700'), URIRef('http://purl.obolibrary.org/obo/NCBITaxon_10239')))
+    return header
+
+
+def write_release_file(msl_id, nt, compress):
+    # Write the standalone ontology of one release: its ontology header
+    # followed by the N-Triples of the release (N-Triples is valid Turtle)
+
+    path = release_file_name(msl_id, compress)
+    stale = release_file_name(msl_id, not compress)
+    if os.path.exists(stale):
+        os.remove(stale)
+
+    # Lines are sorted and the gzip header has no timestamp, so that the
+    # same release always gives the same bytes (see --canonical)
+    header = ontology_header(f'http://ictv.global/id/{msl_id}/', f"ICTV Taxonomy {msl_id}", msl_id).serialize(format='nt')
+    content = (''.join(sorted(header.splitlines(keepends=True))) + ''.join(sorted(nt.splitlines(keepends=True)))).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(gzip.compress(content, mtime=0) if compress else content)
+    return path
+
+
+def read_release_file(path):
+    # Read back the N-Triples of a release file, without its ontology header
+
+    msl_id = os.path.basename(path).split('.')[0]
+    header_subject = f'<http://ictv.global/id/{msl_id}/> '
+
+    with (gzip.open if path.endswith('.gz') else open)(path, 'rt', encoding='utf-8') as f:
+        return ''.join(line for line in f if not line.startswith(header_subject))
+
+
+def build_ontology_for_release(release, compress=False, profile_dir=None):
+
+    print(f'Creating ontology for ICTV release {release['name']}')
+
+    profiler = start_profiler(profile_dir)
+    rss_reset = reset_peak_rss()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+
+    msl_id = 'MSL' + release['msl_release_num']
+
+    nodes_in_release = inputs['nodes_by_release'].get(release['msl_release_num'], inputs['nodes'].iloc[0:0])
+
+    triples = release_triples(release, nodes_in_release)
+    path = write_release_file(msl_id, ''.join(triples), compress)
+
+    stop_profiler(profiler, profile_dir, f'release {msl_id}')
+    return path, {
+        'release': msl_id,
+        'wall_s': time.perf_counter() - wall,
+        'cpu_s': time.process_time() - cpu,
+        'peak_rss_mb': release_peak_rss_mb(rss_reset),
+        'worker_peak_rss_mb': peak_rss_mb(),
+        'rows': len(nodes_in_release),
+        'triples': len(triples),
+    }
+
+
+def build_release_part(release, start, stop, profile_dir=None):
+    # Build the taxa start:stop of a release split by schedule_releases. The
+    # N-Triples are returned to main, which merges the parts of the release
+    # (see merge_release_parts).
+
+    print(f'Creating ontology for ICTV release {release['name']} (taxa {start} to {stop})')
+
+    profiler = start_profiler(profile_dir)
+    rss_reset = reset_peak_rss()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+
+    msl_id = 'MSL' + release['msl_release_num']
+
+    nodes = inputs['nodes_by_release'][release['msl_release_num']].iloc[start:stop]
+
+    triples = release_triples(release, nodes)
+
+    stop_profiler(profiler, profile_dir, f'release {msl_id} taxa {start} to {stop}')
+    return ''.join(triples), {
+        'release': msl_id,
+        'wall_s': time.perf_counter() - wall,
+        'cpu_s': time.process_time() - cpu,
+        'peak_rss_mb': release_peak_rss_mb(rss_reset),
+        'worker_peak_rss_mb': peak_rss_mb(),
+        'rows': len(nodes),
+        'triples': len(triples),
+    }
+
+
+def merge_release_parts(release, parts, compress):
+    # Write the release file from the (N-Triples, stats) of all parts of a
+    # release, in order. Returns its N-Triples and the stats of the release,
+    # where wall and CPU time are summed over the parts.
+
+    msl_id = 'MSL' + release['msl_release_num']
+    triples = dict.fromkeys(line for nt, _ in parts for line in nt.splitlines(keepends=True))
+    nt = ''.join(triples)
+    write_release_file(msl_id, nt, compress)
+
+    stats = [part_stats for _, part_stats in parts]
+    return nt, {
+        'release': msl_id,
+        'wall_s': sum(s['wall_s'] for s in stats),
+        'cpu_s': sum(s['cpu_s'] for s in stats),
+        'peak_rss_mb': max((s['peak_rss_mb'] for s in stats if s['peak_rss_mb'] is not None), default=None),
+        'worker_peak_rss_mb': max(s['worker_peak_rss_mb'] for s in stats),
+        'rows': sum(s['rows'] for s in stats),
+        'triples': len(triples),
+        'parts': len(parts),
+    }
+
+
+def release_triples(release, nodes):
+    # N-Triples lines of the given taxa of a release, with their isolates, as
+    # the keys of a dict. Duplicates (e.g. the same accession on two isolates
+    # of a species) are dropped that way.
+
+    taxnode_id_to_ictv_id = inputs['taxnode_id_to_ictv_id']
+
+    msl_id = 'MSL' + release['msl_release_num']
+
+    lines = class_triples(nodes, msl_id, release['taxnode_id'])
+
+    for taxnode_id, ictv_id in zip(nodes['taxnode_id'], nodes['ictv_id']):
+        replacements = inputs['replacements_by_prev_taxid'].get(taxnode_id)
+        if not replacements:
+            continue
+
+        class_iri = f'<http://ictv.global/id/{msl_id}/ICTV{ictv_id}>'
+        flags = inputs['change_flags_by_prev_taxid'][taxnode_id]
+
+        replacement_iris = []
+
+        for new_taxid, msl in replacements:
+            if pd.isna(new_taxid):
+                continue
+            if new_taxid in taxnode_id_to_ictv_id:
+                replacement_iris.append(f'http://ictv.global/id/MSL{msl}/ICTV'+taxnode_id_to_ictv_id[new_taxid])
+            else:
+                print('Warning: replacement taxid ' + new_taxid + ' not found in release ' + msl)
+                replacement_iris.append(f'http://ictv.global/id/MSL{msl}/ICTV'+new_taxid)
+
+        for replacement_iri in replacement_iris:
+            lines.append(f'{class_iri} <{HAD_REVISION}> <{replacement_iri}> .\n')
+            lines.append(f'<{replacement_iri}> <{WAS_REVISION_OF}> {class_iri} .\n')
+
+        note = None
+        if flags.is_new:
+            year = str(replacements[0][0])[:4]
+            note = "New in " + year
+        elif flags.is_merged:
+            note = f"Merged into {', '.join(replacement_iris)}"
+            lines.append(f'{class_iri} <{OBSOLESCENCE_REASON}> <{TERMS_MERGED}> .\n')
+        elif flags.is_split:
+            note = f"Split into {', '.join(replacement_iris)}"
+            lines.append(f'{class_iri} <{OBSOLESCENCE_REASON}> <{TERM_SPLIT}> .\n')
+        elif flags.is_moved:
+            note = f"Moved to {', '.join(replacement_iris)}"
+        elif flags.is_promoted:
+            note = f"Promoted, see {', '.join(replacement_iris)}"
+        elif flags.is_demoted:
+            note = f"Demoted, see {', '.join(replacement_iris)}"
+        elif flags.is_renamed:
+            note = f"Renamed, see {', '.join(replacement_iris)}"
+        elif flags.is_deleted:
+            note = "Deleted"
+        if note:
+            lines.append(f'{class_iri} <{EDITOR_NOTE}> {nt_literal(note)} .\n')
+
+    lines.extend(isolate_triples(msl_id, release['msl_release_num'], nodes['taxnode_id']))
+
+    return dict.fromkeys(lines)
+
+
+def schedule_releases(to_build, shared, workers, chunk_size=None):
+    # Order the (release, cache_file) to build largest first, by their number
+    # of taxa plus isolate rows, and split every release of more than
+    # chunk_size rows into parts of consecutive taxa. By default chunk_size is
+    # a quarter of the rows per worker, and at least 5000 rows. Returns
+    # (release, cache_file, (start, stop) of the part or None for the whole
+    # release, number of parts of the release) tuples.
+
+    costs = [taxon_costs(release['msl_release_num'], shared) for release, _ in to_build]
+    if not chunk_size:
+        chunk_size = max(5000, sum(int(c.sum()) for c in costs) // (4 * workers))
+
+    tasks = []
+    for (release, cache_file), cost in zip(to_build, costs):
+        total = int(cost.sum())
+        if total <= chunk_size:
+            tasks.append((total, release, cache_file, None, 1))
+            continue
+
+        cumulative = np.cumsum(cost)
+        ends = np.searchsorted(cumulative, np.arange(chunk_size, total, chunk_size)) + 1
+        bounds = [0] + sorted(set(ends.tolist()) - {len(cost)}) + [len(cost)]
+        for start, stop in zip(bounds, bounds[1:]):
+            part_cost = int(cumulative[stop - 1] - (cumulative[start - 1] if start else 0))
+            tasks.append((part_cost, release, cache_file, (start, stop), len(bounds) - 1))
+
+    tasks.sort(key=lambda task: task[0], reverse=True)
+    return [task[1:] for task in tasks]
+
+
+def taxon_costs(msl_release_num, shared):
+    # Rows each taxon of a release adds to its build: the taxon itself, its
+    # isolates and their split names, abbreviations and accessions
+
+    taxnode_ids = shared['nodes_by_release'].get(msl_release_num, shared['nodes'].iloc[0:0])['taxnode_id']
+    costs = np.ones(len(taxnode_ids), dtype=np.int64)
+    for table in ['isolates_by_release', 'isolate_values_by_release']:
+        rows = shared[table].get(msl_release_num)
+        if rows is not None:
+            costs += taxnode_ids.map(rows['taxnode_id'].value_counts()).fillna(0).astype(np.int64).values
+    return costs
+
+
+def class_triples(nodes_in_release, msl_id, release_taxnode_id):
+    # N-Triples lines of the class of every taxon of a release (type, label,
+    # identifier, version, rank, parent, synonym), built column by column
+    # rather than node by node. Missing values propagate through the string
+    # concatenation, so their triples are dropped along with them.
+
+    ranks = nodes_in_release['rank'].map(RANKS)
+    unknown = nodes_in_release['rank'][ranks.isna()]
+    if not unknown.empty:
+        raise Exception(f'Unknown rank {unknown.iloc[0]}')
+
+    parent_iris = '<http://ictv.global/id/' + msl_id + '/ICTV' + nodes_in_release['parent_id'].map(inputs['ictv_id_by_taxnode_id']) + '>'
+    # "Viruses" from NCBITaxon used as the root for the ontology
+    parent_iris = parent_iris.mask(nodes_in_release['parent_id'] == release_taxnode_id, '<http://purl.obolibrary.org/obo/NCBITaxon_10239>')
+
+    class_iris = '<http://ictv.global/id/' + msl_id + '/ICTV' + nodes_in_release['ictv_id'] + '> '
+
+    columns = [
+        class_iris + f'<{RDF.type}> <{OWL.Class}> .\n',
+        class_iris + f'<{RDFS.label}> ' + nt_literals(nodes_in_release['name']) + ' .\n',
+        class_iris + f'<{IDENTIFIER}> "ICTV' + nodes_in_release['ictv_id'] + '" .\n',
+        class_iris + f'<{OWL.versionInfo}> {nt_literal(msl_id)} .\n',
+        class_iris + f'<{RANK}> <' + ranks + '> .\n',
+        class_iris + f'<{RDFS.subClassOf}> ' + parent_iris + ' .\n',
+        class_iris + f'<{RDFS.isDefinedBy}> <{ontology_iri}> .\n',
+        class_iris + f'<{SYNONYM}> ' + nt_literals(nodes_in_release['abbrev_csv']) + ' .\n',
+    ]
+    return pd.concat(columns, ignore_index=True).dropna().tolist()
+
+
+def isolate_triples(msl_id, msl_release_num, taxnode_ids):
+    # N-Triples lines of the isolates of the given taxa of a release and of
+    # the skos:narrowMatch accessions of these taxa, from the exploded tables
+    # of explode_isolates
+
+    isolates = inputs['isolates_by_release'].get(msl_release_num)
+    if isolates is None:
+        return []
+    values = inputs['isolate_values_by_release'].get(msl_release_num, isolates.iloc[0:0].assign(property='', value=''))
+    xrefs = inputs['xrefs_by_release'].get(msl_release_num, values.iloc[0:0])
+
+    isolates = isolates[isolates['taxnode_id'].isin(taxnode_ids)]
+    values = values[values['taxnode_id'].isin(taxnode_ids)]
+    xrefs = xrefs[xrefs['taxnode_id'].isin(taxnode_ids)]
+
+    isolate_iris = '<http://ictv.global/id/VMR' + isolates['isolate_id'] + '> '
+
+    columns = [
+        isolate_iris + f'<{RDF.type}> <{OWL.NamedIndividual}> .\n',
+        isolate_iris + f'<{RDF.type}> <http://ictv.global/id/{msl_id}/ICTV' + isolates['ictv_id'] + '> .\n',
+        isolate_iris + f'<{RDFS.isDefinedBy}> <{ontology_iri}> .\n',
+        '<http://ictv.global/id/VMR' + values['isolate_id'] + '> ' + values['property'] + ' ' + values['value'] + ' .\n',
+        f'<http://ictv.global/id/{msl_id}/ICTV' + xrefs['ictv_id'] + f'> <{SKOS.narrowMatch}> ' + xrefs['value'] + ' .\n',
+    ]
+    return pd.concat(columns, ignore_index=True).tolist()
+
+
+def nt_literal(value):
+    # N-Triples plain literal, escaped like rdflib's N-Triples serializer
+    for char, escaped in NT_ESCAPES:
+        value = value.replace(char, escaped)
+    return f'"{value}"'
+
+
+def nt_literals(values):
+    # nt_literal of a whole column of strings
+    for char, escaped in NT_ESCAPES:
+        values = values.str.replace(char, escaped, regex=False)
+    return '"' + values + '"'
 
 
 def add_xrefs(g, class_iri, field, prefix):
@@ -318,35 +1211,29 @@ def add_xrefs(g, class_iri, field, prefix):
         else:
             g.add((class_iri, URIRef(XREF), Literal(prefix + entry)))
 
-def map_rank(rank):
-    if rank == "realm":
-        return "http://purl.obolibrary.org/obo/TAXRANK_0001004" # clade
-    if rank == "kingdom":
-        return "http://purl.obolibrary.org/obo/TAXRANK_0000017"
-    if rank == "subkingdom":
-        return "http://purl.obolibrary.org/obo/TAXRANK_0000029"
-    if rank == "phylum":
-        return "http://purl.obolibrary.org/obo/TAXRANK_0000001"
-    if rank == "subphylum":
-        return "http://purl.obolibrary.org/obo/TAXRANK_0000008"
-    if rank == "class":
-        return "http://purl.obolibrary.org/obo/TAXRANK_0000002"
-    if rank == "subclass":
-        return "http://purl.obolibrary.org/obo/TAXRANK_0000007"
-    if rank == "order":
-        return "http://purl.obolibrary.org/obo/TAXRANK_0000003"
-    if rank == "suborder":
-        return "http://purl.obolibrary.org/obo/TAXRANK_0000014"
-    if rank == "family":
-        return "http://purl.obolibrary.org/obo/TAXRANK_0000004"
-    if rank == "subfamily":
-        return "http://purl.obolibrary.org/obo/TAXRANK_0000024"
-    if rank == "genus":
-        return "http://purl.obolibrary.org/obo/TAXRANK_0000005"
-    if rank == "subgenus":
-        return "http://purl.obolibrary.org/obo/TAXRANK_0000009"
-    if rank == "species":
-        return "http://purl.obolibrary.org/obo/TAXRANK_0000006"
+def parse_args():
+    parser = argparse.ArgumentParser(description='Build the ICTV ontology from the ICTVdatabase TSV files in data/')
+    parser.add_argument('--cache-dir', default='cache', help='directory of the build cache of parsed inputs and releases (default: %(default)s)')
+    parser.add_argument('--no-cache', dest='cache_dir', action='store_const', const=None, help='parse all inputs and rebuild every release without using the build cache')
+    parser.add_argument('--workers', type=int, help='number of release build processes (default: number of CPUs)')
+    parser.add_argument('--chunk-size', type=int, help='split releases of more than this many taxa plus isolate rows into parts built in parallel (default: a quarter of the rows per worker, at least 5000)')
+    parser.add_argument('--compress', action='store_true', help='gzip the per-release ontology files (out/MSL*.owl.ttl.gz)')
+    parser.add_argument('--report', help='write wall/CPU time, peak RSS, rows and triples of every stage and release to this JSON file')
+    parser.add_argument('--profile-dir', help='write a cProfile dump of every stage and release to this directory')
+    parser.add_argument('--store', default='default', help='rdflib store plugin holding the merged ontology, e.g. Oxigraph with oxrdflib installed (default: in memory)')
+    parser.add_argument('--store-path', help='keep the --store on disk in this file or directory instead of in memory')
+    parser.add_argument('--resolver', default='out/ictv_resolver.sqlite', help='write the offline resolution index (SQLite) to this file (default: %(default)s)')
+    parser.add_argument('--no-resolver', dest='resolver', action='store_const', const=None, help='do not write the offline resolution index')
+    parser.add_argument('--lineage', help='write the ancestors of every class (labels and IRIs, top first) to this JSON lines file')
+    parser.add_argument('--previous', help='previous build of ictv_all_versions.owl.ttl (optionally gzipped) to write a patch against')
+    parser.add_argument('--patch', default='out/ictv_all_versions.rdfp', help='RDF Patch from the --previous build to this one (default: %(default)s)')
+    parser.add_argument('--canonical', action='store_true', help='write the merged ontology as sorted N-Triples with content-hashed blank nodes, and out/manifest.json with the SHA-256 of all output files')
+    parser.add_argument('--streaming', action='store_true', help='write the merged ontology incrementally as N-Triples instead of building it in memory')
+    args = parser.parse_args()
+    if args.store_path and args.store.lower() in MEMORY_STORES:
+        parser.error(f'--store-path needs a persistent --store, the {args.store} store is only kept in memory')
+    return args
+
 
 if __name__ == "__main__":
-    main()
+    main(parse_args())
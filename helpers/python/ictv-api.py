@@ -8,9 +8,13 @@
 # Implementation initially inspired by notebook script created by @jamesamcl
 # https://github.com/EVORA-project/ictv-ontology/blob/main/notebooks/ictv_ols.py
 #
-# This file provides two classes:
+# This file provides six classes:
 #   - ICTVOLSClient     : main client for OLS / ICTV ontology
 #   - ICTVtoNCBImapping : ICTV ↔ NCBI Taxon mapping helper based on SSSOM
+#   - ICTVHttpTransport : pooled, retrying HTTP session shared by both
+#   - AsyncICTVOLSClient : asyncio counterpart of ICTVOLSClient (needs httpx)
+#   - ICTVLRUCache      : bounded, expiring, thread-safe response cache
+#   - ICTVSQLiteCache   : persistent response cache shared by processes
 #
 # Python version: 3.8+
 #
@@ -24,23 +28,59 @@
 # ======================================================================
 
 from __future__ import annotations
+import os
 import re
 import json
-from typing import Any, Dict, List, Optional
+import time
+import zlib
+import sqlite3
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Generator, Iterable, Iterator, List, Optional, Union
 from urllib.parse import quote
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+try:
+    import httpx  # only needed by AsyncICTVOLSClient
+except ImportError:
+    httpx = None
 
-class ICTVOLSClient:
-    def __init__(self, baseUrl: str = 'https://www.ebi.ac.uk/ols4/api/v2/ontologies/ictv'):
+
+class ICTVOLSBase:
+    # Network-free part of the OLS clients, shared by ICTVOLSClient and
+    # AsyncICTVOLSClient: input parsing, entity mapping and the resolution
+    # steps; the clients only perform the requests.
+
+    def __init__(self, baseUrl: str = 'https://www.ebi.ac.uk/ols4/api/v2/ontologies/ictv',
+                 iriCache: Optional[ICTVLRUCache] = None,
+                 classCache: Optional[ICTVLRUCache] = None):
         self.baseUrl: str = baseUrl.rstrip('/')
         self.headers: Dict[str, str] = {"Accept": "application/json"}
-        self.ncbiMapper: ICTVtoNCBImapping = ICTVtoNCBImapping()
 
+        # Any object with get(key) -> value or None and set(key, value) can
+        # be passed as a cache.
         # IRI -> raw OLS entity
-        self.iriCache: Dict[str, Dict[str, Any]] = {}
+        self.iriCache: ICTVLRUCache = iriCache if iriCache is not None else ICTVLRUCache(maxEntries=100000)
         # OLS endpoint+query key -> OLS response
-        self.classCache: Dict[str, Dict[str, Any]] = {}
+        self.classCache: ICTVLRUCache = classCache if classCache is not None else ICTVLRUCache(maxEntries=20000)
+
+    def cacheStats(self) -> Dict[str, Dict[str, int]]:
+        return {name: cache.stats() for name, cache in [('iri', self.iriCache), ('class', self.classCache)]
+                if hasattr(cache, 'stats')}
+
+    def versionedCaches(self) -> List[ICTVSQLiteCache]:
+        # caches outliving the client, to invalidate when the ontology changes
+        return [cache for cache in (self.iriCache, self.classCache) if hasattr(cache, 'setVersion')]
+
+    def ontologyVersion(self, ontology: Dict[str, Any]) -> Optional[str]:
+        # latest MSL of the ontology, e.g. 'MSL40', from its OLS description
+        return self.normalizeValue(ontology.get("http://www.w3.org/2002/07/owl#versionInfo") or ontology.get('version'))
 
     # -------------------- tiny utils --------------------
     def normalizeValue(self, value: Any) -> Any:
@@ -79,46 +119,109 @@ class ICTVOLSClient:
         items = sorted((k, str(v)) for k, v in params.items())
         return endpoint + '|' + '&'.join(f'{k}={v}' for k, v in items)
 
-    def fetchit(self, url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        params = params or {}
-        try:
-            r = requests.get(url, params=params, headers=self.headers, timeout=30)
-            r.raise_for_status()
-            return r.json()
-        except requests.RequestException as e:
-            status = getattr(e.response, 'status_code', 'N/A')
-            raise Exception(f"Fetch failed ({status}) for {r.url if 'r' in locals() else url}: {e}")
+    def _batchKey(self, inputRaw: Any) -> Any:
+        return ' '.join(inputRaw.split()) if isinstance(inputRaw, str) else inputRaw
 
-    def ols(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        params = params.copy() if params else {}
-        params.setdefault("size", 1000)
-        cacheKey = self._cache_key(endpoint, params)
-        if cacheKey in self.classCache:
-            return self.classCache[cacheKey]
-        result = self.fetchit(f"{self.baseUrl}/{endpoint}", params)
-        self.classCache[cacheKey] = result
-        return result
+    def latestNcbiHitIri(self, hits: List[Dict[str, Any]]) -> str:
+        best = None
+        for h in hits:
+            n = self.parseMsl(h.get('msl'))
+            if best is None or n > best['n']:
+                best = {'h': h, 'n': n}
+        return f"http://ictv.global/id/{best['h']['msl']}/{best['h']['ictv_id']}"
 
-    # -------------------- entity fetch (with cache) --------------------
-    def retrieveTaxonByIRI(self, iri: Optional[str]) -> Optional[Dict[str, Any]]:
-        if not iri:
-            return None
-        if iri in self.iriCache:
-            return self.iriCache[iri]
-        # OLS expects double-encoded entity IRIs
-        enc = quote(quote(iri, safe=''), safe='')
-        res = self.fetchit(f"{self.baseUrl}/entities/{enc}")
-        self.iriCache[iri] = res
-        return res
+    # -------------------- Mapping (with rank restored) --------------------
+    def mapEntity(self, e: Dict[str, Any]) -> Dict[str, Any]:
+        label = self.normalizeValue(e.get('label') or e.get("http://www.w3.org/2000/01/rdf-schema#label"))
 
-    def getTaxonByIRI(self, iri: str) -> Optional[Dict[str, Any]]:
-        e = self.retrieveTaxonByIRI(iri)
+        # synonyms
+        synonyms: List[str] = []
+        for key in ["synonym", "http://www.geneontology.org/formats/oboInOwl#hasExactSynonym"]:
+            for s in self.toArray(e.get(key) or []):
+                if isinstance(s, dict) and 'value' in s:
+                    synonyms.append(s['value'])
+                elif isinstance(s, str):
+                    synonyms.append(s)
+                elif isinstance(s, list):
+                    synonyms.append(self.normalizeValue(s))
+
+        # rank (iri + label), including linkedEntities fallback
+        rankIri = e.get("http://purl.obolibrary.org/obo/TAXRANK_1000000") or (e.get('rank', {}) or {}).get('iri')
+        rankLabel = (e.get('rank', {}) or {}).get('label')
+        if rankIri and 'linkedEntities' in e and rankIri in e['linkedEntities'] and 'label' in e['linkedEntities'][rankIri]:
+            rankLabel = self.normalizeValue(e['linkedEntities'][rankIri]['label'])
+
+        # obsolescence reason
+        reasonIri = e.get("http://purl.obolibrary.org/obo/IAO_0000225") or e.get("oboInOwl:hasObsolescenceReason")
+        reasonText = self.mapReasonIriToText(reasonIri)
+
+        msl = e.get("http://www.w3.org/2002/07/owl#versionInfo")
+        ictv_id = e.get("http://purl.org/dc/terms/identifier")
+
+        mapped = {
+            # identity
+            'msl': msl,
+            'ictv_id': ictv_id,
+            'ictv_curie': f"ictv:{msl}/{ictv_id}" if (msl and ictv_id) else None,
+            'iri': e.get("iri"),
+
+            # names
+            'label': label,
+            'synonyms': list(dict.fromkeys(synonyms)),  # dedupe, keep order
+
+            # status
+            'is_obsolete': e.get("isObsolete", False),
+            'obsolescence_reason': reasonText,
+            'reason_iri': reasonIri,
+
+            # parents / lineage
+            'direct_parent_iri': self.normalizeValue(e.get("directParent") or e.get("direct_parent")),
+            'ancestors_iris': e.get("ancestors") or e.get("hierarchicalAncestor") or [],
+
+            # rank
+            'rank': {
+                'iri': rankIri,
+                'label': rankLabel
+            },
+
+            # revision links
+            'replaced_by': e.get("http://purl.obolibrary.org/obo/IAO_0100001"),
+            'was_revision_of': e.get("http://www.w3.org/ns/prov#wasRevisionOf"),
+            'had_revision': e.get("http://www.w3.org/ns/prov#hadRevision"),
+
+            # external matches (raw list)
+            'narrow_match': self.toArray(e.get("http://www.w3.org/2004/02/skos/core#narrowMatch") or [])
+        }
+        return mapped
+
+    def mapReasonIriToText(self, reasonIri: Optional[str]) -> Optional[str]:
+        if reasonIri == "http://purl.obolibrary.org/obo/IAO_0000229":
+            return "SPLIT"
+        if reasonIri == "http://purl.obolibrary.org/obo/IAO_0000227":
+            return "MERGED"
+        return None
+
+    def sortCandidates(self, arr: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        def msl_num(el: Dict[str, Any]) -> int:
+            return self.parseMsl(el.get("http://www.w3.org/2002/07/owl#versionInfo", ''))
+        return sorted(arr, key=msl_num, reverse=True)
+
+    # -------------------- Resolution steps --------------------
+    # The resolution logic is written once for both clients, as generators
+    # yielding the requests they need and sent back their results, which
+    # ICTVOLSClient fetches in turn and AsyncICTVOLSClient awaits:
+    #   ('entity', iri)           -> raw OLS entity (retrieveTaxonByIRI)
+    #   ('ols', endpoint, params) -> cached OLS response (ols)
+    #   ('fetch', url, params)    -> uncached response (fetchit)
+    #   ('ncbi',)                 -> the loaded ICTVtoNCBImapping
+    #   ('all', [requests])       -> results of several requests, concurrently if possible
+
+    def _getTaxonByIRISteps(self, iri: str):
+        e = yield ('entity', iri)
         return self.mapEntity(e) if e else None
 
-    # -------------------- Suggestions (OLS autosuggest) --------------------
-    def getSuggestions(self, query: str) -> List[str]:
-        url = "https://www.ebi.ac.uk/ols4/api/suggest"
-        data = self.fetchit(url, {"ontology": "ictv", "q": query})
+    def _getSuggestionsSteps(self, query: str):
+        data = yield ('fetch', "https://www.ebi.ac.uk/ols4/api/suggest", {"ontology": "ictv", "q": query})
         docs = (data.get('response') or {}).get('docs', [])
         sugs = {}
         for d in docs:
@@ -127,8 +230,7 @@ class ICTVOLSClient:
                 sugs[v] = True
         return list(sugs.keys())
 
-    # -------------------- Input resolution (tunable) --------------------
-    def resolveToLatest(self, inputRaw: Any, options: Dict[str, bool] = None) -> Dict[str, Any]:
+    def _resolveToLatestSteps(self, inputRaw: Any, options: Optional[Dict[str, bool]]):
         if options is None:
             options = {'replacements': True, 'enrichLineage': True, 'suggestions': True}
 
@@ -138,56 +240,51 @@ class ICTVOLSClient:
 
         # 1) direct IRI
         if isinstance(input_val, str) and self.isIctvIri(input_val):
-            return self._resolveEntityByIri(input_val, options)
+            return (yield from self._resolveEntityByIriSteps(input_val, options))
 
         # 2) ICTV ID
         if isinstance(input_val, str) and self.isIctvId(input_val):
-            return self._resolveEntityById(input_val, options)
+            return (yield from self._resolveEntityByIdSteps(input_val, options))
 
         # 3) NCBI TaxID
         if isinstance(input_val, str) and (input_val.isdigit() or re.match(r'^ncbitaxon:\d+$', input_val, re.I)):
-            hits = self.ncbiMapper.getIctvFromNcbi(input_val)
+            ncbiMapper = yield ('ncbi',)
+            hits = ncbiMapper.getIctvFromNcbi(input_val)
             if hits:
-                best = None
-                for h in hits:
-                    n = self.parseMsl(h.get('msl'))
-                    if best is None or n > best['n']:
-                        best = {'h': h, 'n': n}
-                iri = f"http://ictv.global/id/{best['h']['msl']}/{best['h']['ictv_id']}"
-                return self._resolveEntityByIri(iri, options)
+                return (yield from self._resolveEntityByIriSteps(self.latestNcbiHitIri(hits), options))
 
         # 4) individuals → parent class
-        ind = self.seekOntologyTaxon('individuals', {'label': input_val}) or \
-              self.seekOntologyTaxon('individuals', {'synonym': input_val})
+        ind = (yield from self._seekOntologyTaxonSteps('individuals', {'label': input_val})) or \
+              (yield from self._seekOntologyTaxonSteps('individuals', {'synonym': input_val}))
         if ind:
             for e in ind:
                 pIri = self.normalizeValue(e.get('directParent'))
                 if pIri:
-                    return self._resolveEntityByIri(pIri, options)
+                    return (yield from self._resolveEntityByIriSteps(pIri, options))
 
         # 5) label / synonym
-        found = (self.seekOntologyTaxon('classes', {'label': input_val, 'isObsolete': 'false'}) or
-                 self.seekOntologyTaxon('classes', {'label': input_val, 'isObsolete': 'true'}) or
-                 self.seekOntologyTaxon('classes', {'synonym': input_val}))
+        found = ((yield from self._seekOntologyTaxonSteps('classes', {'label': input_val, 'isObsolete': 'false'})) or
+                 (yield from self._seekOntologyTaxonSteps('classes', {'label': input_val, 'isObsolete': 'true'})) or
+                 (yield from self._seekOntologyTaxonSteps('classes', {'synonym': input_val})))
 
         if not found:
-            rel = self.seekOntologyTaxon('classes', {'q': input_val, 'isObsolete': 'false'}) or []
+            rel = (yield from self._seekOntologyTaxonSteps('classes', {'q': input_val, 'isObsolete': 'false'})) or []
             if rel:
                 found = rel
 
         if found:
             sorted_cands = self.sortCandidates(found)
-            return self._resolveEntityByIri(sorted_cands[0]['iri'], options)
+            return (yield from self._resolveEntityByIriSteps(sorted_cands[0]['iri'], options))
 
         # 6) suggestions fallback
         return {
             'status': 'not-found',
             'input': input_val,
-            'suggestions': self.getSuggestions(input_val) if options.get('suggestions') else []
+            'suggestions': (yield from self._getSuggestionsSteps(input_val)) if options.get('suggestions') else []
         }
 
-    def _resolveEntityByIri(self, iri: str, options: Dict[str, bool]) -> Dict[str, Any]:
-        e = self.retrieveTaxonByIRI(iri)
+    def _resolveEntityByIriSteps(self, iri: str, options: Dict[str, bool]):
+        e = yield ('entity', iri)
         if not e:
             return {'status': 'not-found', 'input': iri}
 
@@ -195,20 +292,21 @@ class ICTVOLSClient:
         if not e.get('http://purl.org/dc/terms/identifier'):
             p = self.normalizeValue(e.get('directParent'))
             if p:
-                e = self.retrieveTaxonByIRI(p)
+                e = yield ('entity', p)
 
         if not e:
             return {'status': 'not-found', 'input': iri}
 
         mapped = self.mapEntity(e)
         if options.get('enrichLineage'):
-            mapped = self.enrichLineage(mapped)
+            mapped = yield from self._enrichLineageSteps(mapped)
 
         if not mapped['is_obsolete']:
-            ncbi = self.ncbiMapper.getNcbiTaxon(mapped['ictv_id'], mapped['msl'])
+            ncbiMapper = yield ('ncbi',)
+            ncbi = ncbiMapper.getNcbiTaxon(mapped['ictv_id'], mapped['msl'])
             return {'status': 'current', 'input': iri, 'current': mapped, 'ncbi': ncbi}
 
-        replacements = self.followReplacements(mapped, options) if options.get('replacements') else []
+        replacements = (yield from self._followReplacementsSteps(mapped, options)) if options.get('replacements') else []
         return {
             'status': 'obsolete',
             'input': iri,
@@ -218,15 +316,14 @@ class ICTVOLSClient:
             'final': (replacements[0] if replacements else None)
         }
 
-    def _resolveEntityById(self, ictvId: str, options: Dict[str, bool]) -> Dict[str, Any]:
-        candidates = self.seekOntologyTaxonByClassId(ictvId)
+    def _resolveEntityByIdSteps(self, ictvId: str, options: Dict[str, bool]):
+        candidates = yield from self._seekOntologyTaxonByClassIdSteps(ictvId)
         if not candidates:
             return {'status': 'not-found', 'input': ictvId}
         sorted_cands = self.sortCandidates(candidates)
-        return self._resolveEntityByIri(sorted_cands[0]['iri'], options)
+        return (yield from self._resolveEntityByIriSteps(sorted_cands[0]['iri'], options))
 
-    # -------------------- Replacement chain --------------------
-    def followReplacements(self, entity: Dict[str, Any], options: Dict[str, bool]) -> List[Dict[str, Any]]:
+    def _followReplacementsSteps(self, entity: Dict[str, Any], options: Dict[str, bool]):
         queue = self.toIriArray(entity.get('replaced_by'))
         seen = set()
         results: List[Dict[str, Any]] = []
@@ -237,13 +334,13 @@ class ICTVOLSClient:
                 continue
             seen.add(iri)
 
-            e = self.retrieveTaxonByIRI(iri)
+            e = yield ('entity', iri)
             if not e:
                 continue
 
             mapped = self.mapEntity(e)
             if options.get('enrichLineage'):
-                mapped = self.enrichLineage(mapped)
+                mapped = yield from self._enrichLineageSteps(mapped)
 
             if mapped['is_obsolete'] and mapped.get('replaced_by'):
                 for r in self.toIriArray(mapped['replaced_by']):
@@ -254,42 +351,41 @@ class ICTVOLSClient:
         results.sort(key=lambda a: self.parseMsl(a.get('msl')), reverse=True)
         return results
 
-    # -------------------- Lineage enrichment --------------------
-    def enrichLineage(self, mapped: Dict[str, Any]) -> Dict[str, Any]:
+    def _enrichLineageSteps(self, mapped: Dict[str, Any]):
         # direct parent label
         mapped['direct_parent_label'] = None
         if mapped.get('direct_parent_iri'):
-            p = self.retrieveTaxonByIRI(mapped['direct_parent_iri'])
+            p = yield ('entity', mapped['direct_parent_iri'])
             if p:
                 mapped['direct_parent_label'] = self.normalizeValue(
                     p.get('label') or p.get("http://www.w3.org/2000/01/rdf-schema#label")
                 )
-    
+
         # ordered lineage reconstructed from parent chain
         lineage_labels: List[str] = []
         lineage_iris: List[str] = []
 
         seen = set()
         current_iri = mapped.get('direct_parent_iri')
-    
+
         while current_iri and current_iri not in seen:
             seen.add(current_iri)
-    
-            parent_raw = self.retrieveTaxonByIRI(current_iri)
+
+            parent_raw = yield ('entity', current_iri)
             if not parent_raw:
                 break
-    
+
             parent_label = self.normalizeValue(
                 parent_raw.get('label') or parent_raw.get("http://www.w3.org/2000/01/rdf-schema#label")
             )
             if parent_label:
                 lineage_labels.append(parent_label)
                 lineage_iris.append(current_iri)
-    
+
             current_iri = self.normalizeValue(
                 parent_raw.get("directParent") or parent_raw.get("direct_parent")
             )
-    
+
         lineage_labels.reverse()
         lineage_iris.reverse()
 
@@ -297,122 +393,43 @@ class ICTVOLSClient:
         mapped['ancestors_iris'] = lineage_iris
         return mapped
 
-    # -------------------- Mapping (with rank restored) --------------------
-    def mapEntity(self, e: Dict[str, Any]) -> Dict[str, Any]:
-        label = self.normalizeValue(e.get('label') or e.get("http://www.w3.org/2000/01/rdf-schema#label"))
-
-        # synonyms
-        synonyms: List[str] = []
-        for key in ["synonym", "http://www.geneontology.org/formats/oboInOwl#hasExactSynonym"]:
-            for s in self.toArray(e.get(key) or []):
-                if isinstance(s, dict) and 'value' in s:
-                    synonyms.append(s['value'])
-                elif isinstance(s, str):
-                    synonyms.append(s)
-                elif isinstance(s, list):
-                    synonyms.append(self.normalizeValue(s))
-
-        # rank (iri + label), including linkedEntities fallback
-        rankIri = e.get("http://purl.obolibrary.org/obo/TAXRANK_1000000") or (e.get('rank', {}) or {}).get('iri')
-        rankLabel = (e.get('rank', {}) or {}).get('label')
-        if rankIri and 'linkedEntities' in e and rankIri in e['linkedEntities'] and 'label' in e['linkedEntities'][rankIri]:
-            rankLabel = self.normalizeValue(e['linkedEntities'][rankIri]['label'])
-
-        # obsolescence reason
-        reasonIri = e.get("http://purl.obolibrary.org/obo/IAO_0000225") or e.get("oboInOwl:hasObsolescenceReason")
-        reasonText = self.mapReasonIriToText(reasonIri)
-
-        msl = e.get("http://www.w3.org/2002/07/owl#versionInfo")
-        ictv_id = e.get("http://purl.org/dc/terms/identifier")
-
-        mapped = {
-            # identity
-            'msl': msl,
-            'ictv_id': ictv_id,
-            'ictv_curie': f"ictv:{msl}/{ictv_id}" if (msl and ictv_id) else None,
-            'iri': e.get("iri"),
-
-            # names
-            'label': label,
-            'synonyms': list(dict.fromkeys(synonyms)),  # dedupe, keep order
-
-            # status
-            'is_obsolete': e.get("isObsolete", False),
-            'obsolescence_reason': reasonText,
-            'reason_iri': reasonIri,
-
-            # parents / lineage
-            'direct_parent_iri': self.normalizeValue(e.get("directParent") or e.get("direct_parent")),
-            'ancestors_iris': e.get("ancestors") or e.get("hierarchicalAncestor") or [],
-
-            # rank
-            'rank': {
-                'iri': rankIri,
-                'label': rankLabel
-            },
-
-            # revision links
-            'replaced_by': e.get("http://purl.obolibrary.org/obo/IAO_0100001"),
-            'was_revision_of': e.get("http://www.w3.org/ns/prov#wasRevisionOf"),
-            'had_revision': e.get("http://www.w3.org/ns/prov#hadRevision"),
-
-            # external matches (raw list)
-            'narrow_match': self.toArray(e.get("http://www.w3.org/2004/02/skos/core#narrowMatch") or [])
-        }
-        return mapped
-
-    def mapReasonIriToText(self, reasonIri: Optional[str]) -> Optional[str]:
-        if reasonIri == "http://purl.obolibrary.org/obo/IAO_0000229":
-            return "SPLIT"
-        if reasonIri == "http://purl.obolibrary.org/obo/IAO_0000227":
-            return "MERGED"
-        return None
-
-    # -------------------- Seekers --------------------
-    def seekOntologyTaxon(self, endpoint: str, params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
-        data = self.ols(endpoint, params)
+    def _seekOntologyTaxonSteps(self, endpoint: str, params: Dict[str, Any]):
+        data = yield ('ols', endpoint, params)
         return data.get('elements')
 
-    def seekOntologyTaxonByClassId(self, id_: str) -> List[Dict[str, Any]]:
-        curr = self.seekOntologyTaxon('classes', {
-            "http://purl.org/dc/terms/identifier": id_, "isObsolete": "false"
-        }) or []
-        obs = self.seekOntologyTaxon('classes', {
-            "http://purl.org/dc/terms/identifier": id_, "isObsolete": "true"
-        }) or []
-        return curr + obs
-
-    def seekOntologyTaxonByClassLabel(self, label: str) -> List[Dict[str, Any]]:
-        curr = self.seekOntologyTaxon('classes', {"label": label, "isObsolete": "false"}) or []
-        obs = self.seekOntologyTaxon('classes', {"label": label, "isObsolete": "true"}) or []
-        return curr + obs
-
-    def seekOntologyTaxonBySynonym(self, synonym: str) -> List[Dict[str, Any]]:
-        return self.seekOntologyTaxon('classes', {"synonym": synonym}) or []
-
-    def seekOntologyTaxonByIndividual(self, labelOrSyn: str) -> List[Dict[str, Any]]:
-        indsLabel = self.seekOntologyTaxon('individuals', {'label': labelOrSyn}) or []
-        indsSyn = self.seekOntologyTaxon('individuals', {'synonym': labelOrSyn}) or []
-        all_inds = indsLabel + indsSyn
-        parents = []
-        seen = set()
+    def _seekOntologyTaxonByClassIdSteps(self, id_: str):
+        curr, obs = yield ('all', [
+            ('ols', 'classes', {"http://purl.org/dc/terms/identifier": id_, "isObsolete": "false"}),
+            ('ols', 'classes', {"http://purl.org/dc/terms/identifier": id_, "isObsolete": "true"}),
+        ])
+        return (curr.get('elements') or []) + (obs.get('elements') or [])
+
+    def _seekOntologyTaxonByClassLabelSteps(self, label: str):
+        curr, obs = yield ('all', [
+            ('ols', 'classes', {"label": label, "isObsolete": "false"}),
+            ('ols', 'classes', {"label": label, "isObsolete": "true"}),
+        ])
+        return (curr.get('elements') or []) + (obs.get('elements') or [])
+
+    def _seekOntologyTaxonBySynonymSteps(self, synonym: str):
+        return (yield from self._seekOntologyTaxonSteps('classes', {"synonym": synonym})) or []
+
+    def _seekOntologyTaxonByIndividualSteps(self, labelOrSyn: str):
+        indsLabel, indsSyn = yield ('all', [
+            ('ols', 'individuals', {'label': labelOrSyn}),
+            ('ols', 'individuals', {'synonym': labelOrSyn}),
+        ])
+        all_inds = (indsLabel.get('elements') or []) + (indsSyn.get('elements') or [])
+        parentIris = []
         for ind in all_inds:
             pIri = self.normalizeValue(ind.get('directParent'))
-            if pIri and pIri not in seen:
-                seen.add(pIri)
-                p = self.retrieveTaxonByIRI(pIri)
-                if p and p.get("http://purl.org/dc/terms/identifier"):
-                    parents.append(p)
-        return parents
+            if pIri and pIri not in parentIris:
+                parentIris.append(pIri)
+        parents = yield ('all', [('entity', pIri) for pIri in parentIris])
+        return [p for p in parents if p and p.get("http://purl.org/dc/terms/identifier")]
 
-    def sortCandidates(self, arr: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        def msl_num(el: Dict[str, Any]) -> int:
-            return self.parseMsl(el.get("http://www.w3.org/2002/07/owl#versionInfo", ''))
-        return sorted(arr, key=msl_num, reverse=True)
-
-    # -------------------- Extras / Public helpers --------------------
-    def getCurrentReplacements(self, idOrLabelOrEntity: Any) -> List[Dict[str, Any]]:
-        res = self.resolveToLatest(idOrLabelOrEntity, {
+    def _getCurrentReplacementsSteps(self, idOrLabelOrEntity: Any):
+        res = yield from self._resolveToLatestSteps(idOrLabelOrEntity, {
             'replacements': True, 'enrichLineage': False, 'suggestions': False
         })
 
@@ -427,7 +444,7 @@ class ICTVOLSClient:
             obsolete = res.get('obsolete') or {}
             label = obsolete.get('label')
             if label:
-                res2 = self.resolveToLatest(label, {
+                res2 = yield from self._resolveToLatestSteps(label, {
                     'replacements': True, 'enrichLineage': False, 'suggestions': False
                 })
                 if res2.get('status') == 'current' and res2.get('current'):
@@ -437,15 +454,15 @@ class ICTVOLSClient:
 
         return []
 
-    def findCandidates(self, idOrLabel: str) -> List[Dict[str, Any]]:
+    def _findCandidatesSteps(self, idOrLabel: str):
         if 'ICTV' in idOrLabel:
-            candidates = self.seekOntologyTaxonByClassId(idOrLabel)
+            candidates = yield from self._seekOntologyTaxonByClassIdSteps(idOrLabel)
         else:
-            candidates = self.seekOntologyTaxonByClassLabel(idOrLabel)
+            candidates = yield from self._seekOntologyTaxonByClassLabelSteps(idOrLabel)
             if not candidates:
-                candidates = self.seekOntologyTaxonBySynonym(idOrLabel)
+                candidates = yield from self._seekOntologyTaxonBySynonymSteps(idOrLabel)
             if not candidates:
-                candidates = self.seekOntologyTaxonByIndividual(idOrLabel)
+                candidates = yield from self._seekOntologyTaxonByIndividualSteps(idOrLabel)
         if not candidates:
             return []
         candidates = self.sortCandidates(candidates)
@@ -453,26 +470,26 @@ class ICTVOLSClient:
             el['_msl_number'] = self.parseMsl(el.get("http://www.w3.org/2002/07/owl#versionInfo", ''))
         return candidates
 
-    def findLatest(self, idOrLabel: str) -> Optional[Dict[str, Any]]:
-        res = self.resolveToLatest(idOrLabel, {
+    def _findLatestSteps(self, idOrLabel: str):
+        res = yield from self._resolveToLatestSteps(idOrLabel, {
             'replacements': False, 'enrichLineage': False, 'suggestions': False
         })
         return res.get('current') or res.get('final') or res.get('obsolete')
 
-    def getSynonyms(self, idOrLabelOrEntity: Any) -> List[str]:
-        entity = self._resolveAsEntity(idOrLabelOrEntity)
+    def _getSynonymsSteps(self, idOrLabelOrEntity: Any):
+        entity = yield from self._resolveAsEntitySteps(idOrLabelOrEntity)
         return list(dict.fromkeys(entity.get('synonyms', []))) if entity else []
 
-    def getIndividuals(self, idOrLabelOrEntity: Any) -> Dict[str, Any]:
-        entity = self._resolveAsEntity(idOrLabelOrEntity)
+    def _getIndividualsSteps(self, idOrLabelOrEntity: Any):
+        entity = yield from self._resolveAsEntitySteps(idOrLabelOrEntity)
         if not entity or not entity.get('iri'):
             return {}
         enc = quote(quote(entity['iri'], safe=''), safe='')
-        data = self.fetchit(f"{self.baseUrl}/classes/{enc}/individuals", {"size": 1000})
+        data = yield ('fetch', f"{self.baseUrl}/classes/{enc}/individuals", {"size": 1000})
         return data
 
-    def getIndividualsNames(self, idOrLabelOrEntity: Any) -> List[str]:
-        data = self.getIndividuals(idOrLabelOrEntity)
+    def _getIndividualsNamesSteps(self, idOrLabelOrEntity: Any):
+        data = yield from self._getIndividualsSteps(idOrLabelOrEntity)
         names = {}
         for ind in (data.get('elements') or []):
             label = ind.get('label') or ind.get("http://www.w3.org/2000/01/rdf-schema#label")
@@ -481,12 +498,12 @@ class ICTVOLSClient:
                 names[label] = True
         return list(names.keys())
 
-    def getAllFromRelease(self, release: str) -> List[Dict[str, Any]]:
+    def _getAllFromReleaseSteps(self, release: str):
         page = 0
         size = 1000
         all_items: List[Dict[str, Any]] = []
         while True:
-            data = self.fetchit(f"{self.baseUrl}/classes", {
+            data = yield ('fetch', f"{self.baseUrl}/classes", {
                 "http://www.w3.org/2002/07/owl#versionInfo": release,
                 "size": size,
                 "page": page
@@ -499,21 +516,21 @@ class ICTVOLSClient:
                 break
         return all_items
 
-    def getTaxonByRelease(self, ictvId: str, release: str) -> Optional[Dict[str, Any]]:
-        data = self.ols('classes', {
+    def _getTaxonByReleaseSteps(self, ictvId: str, release: str):
+        data = yield ('ols', 'classes', {
             "http://www.w3.org/2002/07/owl#versionInfo": release,
             "http://purl.org/dc/terms/identifier": ictvId
         })
         el = (data.get('elements') or [None])[0]
         return self.mapEntity(el) if el else None
 
-    def getHistory(self, idOrLabelOrEntity: Any) -> List[Dict[str, Any]]:
-        entityRaw = self._resolveAsEntity(idOrLabelOrEntity)
+    def _getHistorySteps(self, idOrLabelOrEntity: Any):
+        entityRaw = yield from self._resolveAsEntitySteps(idOrLabelOrEntity)
         if not entityRaw:
             return []
 
         # Ensure we traverse from a raw OLS entity
-        entity = self.retrieveTaxonByIRI(entityRaw['iri']) or entityRaw
+        entity = (yield ('entity', entityRaw['iri'])) or entityRaw
 
         seen = set()
         history: List[Dict[str, Any]] = []
@@ -527,44 +544,44 @@ class ICTVOLSClient:
                 return
             seen.add(seenKey)
 
-            mapped_enriched = self.enrichLineage(mapped)
+            mapped_enriched = yield from self._enrichLineageSteps(mapped)
             history.append(mapped_enriched)
 
             for key in ['was_revision_of', 'had_revision']:
                 for iri in self.toIriArray(mapped_enriched.get(key)):
-                    nxt = self.retrieveTaxonByIRI(iri)
+                    nxt = yield ('entity', iri)
                     if nxt:
-                        walk(nxt)
+                        yield from walk(nxt)
 
-        walk(entity)
+        yield from walk(entity)
         history.sort(key=lambda a: self.parseMsl(a.get('msl')), reverse=True)
         return history
 
-    def getHistoricalParent(self, idOrLabelOrEntity: Any) -> Optional[Dict[str, Any]]:
-        entity = self._resolveAsEntity(idOrLabelOrEntity)
+    def _getHistoricalParentSteps(self, idOrLabelOrEntity: Any):
+        entity = yield from self._resolveAsEntitySteps(idOrLabelOrEntity)
         if not entity:
             return None
         for key in ['was_revision_of', 'had_revision']:
             for iri in self.toIriArray(entity.get(key)):
-                parent = self.retrieveTaxonByIRI(iri)
+                parent = yield ('entity', iri)
                 return self.mapEntity(parent) if parent else None
         return None
 
-    def getObsolescenceReason(self, idOrLabelOrEntity: Any) -> Optional[str]:
-        entity = self._resolveAsEntity(idOrLabelOrEntity)
+    def _getObsolescenceReasonSteps(self, idOrLabelOrEntity: Any):
+        entity = yield from self._resolveAsEntitySteps(idOrLabelOrEntity)
         if not entity or not entity.get('is_obsolete', False):
             return None
         return entity.get('reason_iri')
 
-    def getTextualObsolescenceReason(self, idOrLabelOrEntity: Any) -> Optional[str]:
-        iri = self.getObsolescenceReason(idOrLabelOrEntity)
+    def _getTextualObsolescenceReasonSteps(self, idOrLabelOrEntity: Any):
+        iri = yield from self._getObsolescenceReasonSteps(idOrLabelOrEntity)
         return self.mapReasonIriToText(iri)
 
     # Internal: resolve input or entity to a mapped entity array.
-    def _resolveAsEntity(self, idOrLabelOrEntity: Any) -> Optional[Dict[str, Any]]:
+    def _resolveAsEntitySteps(self, idOrLabelOrEntity: Any):
         if isinstance(idOrLabelOrEntity, dict) and 'iri' in idOrLabelOrEntity:
             return idOrLabelOrEntity
-        res = self.resolveToLatest(idOrLabelOrEntity, {
+        res = yield from self._resolveToLatestSteps(idOrLabelOrEntity, {
             'replacements': True, 'enrichLineage': False, 'suggestions': False
         })
         if res.get('status') == 'current':
@@ -574,15 +591,467 @@ class ICTVOLSClient:
         return None
 
 
+class ICTVOLSClient(ICTVOLSBase):
+    def __init__(self, baseUrl: str = 'https://www.ebi.ac.uk/ols4/api/v2/ontologies/ictv',
+                 transport: Optional[ICTVHttpTransport] = None,
+                 iriCache: Optional[ICTVLRUCache] = None,
+                 classCache: Optional[ICTVLRUCache] = None):
+        super().__init__(baseUrl, iriCache, classCache)
+        # one pooled session for OLS and the SSSOM mapping file
+        self.transport: ICTVHttpTransport = transport or ICTVHttpTransport()
+        self.ncbiMapper: ICTVtoNCBImapping = ICTVtoNCBImapping(self.transport)
+
+    def fetchit(self, url: str, params: Optional[Dict[str, Any]] = None,
+                timeout: Optional[float] = None) -> Dict[str, Any]:
+        params = params or {}
+        try:
+            return self.transport.get(url, params=params, headers=self.headers, timeout=timeout).json()
+        except requests.RequestException as e:
+            status = getattr(e.response, 'status_code', 'N/A')
+            failedUrl = e.response.url if e.response is not None else url
+            raise Exception(f"Fetch failed ({status}) for {failedUrl}: {e}")
+
+    def close(self) -> None:
+        self.transport.close()
+
+    def checkCacheVersion(self, force: bool = False) -> None:
+        # Empty the persistent caches if the ontology version changed since
+        # they were filled. OLS is asked at most every versionCheckInterval.
+        caches = self.versionedCaches()
+        if caches and (force or any(cache.needsVersionCheck() for cache in caches)):
+            version = self.ontologyVersion(self.fetchit(self.baseUrl))
+            for cache in caches:
+                cache.setVersion(version)
+
+    def ols(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        params = params.copy() if params else {}
+        params.setdefault("size", 1000)
+        self.checkCacheVersion()
+        cacheKey = self._cache_key(endpoint, params)
+        result = self.classCache.get(cacheKey)
+        if result is not None:
+            return result
+        result = self.fetchit(f"{self.baseUrl}/{endpoint}", params)
+        self.classCache.set(cacheKey, result)
+        return result
+
+    # -------------------- entity fetch (with cache) --------------------
+    def retrieveTaxonByIRI(self, iri: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not iri:
+            return None
+        self.checkCacheVersion()
+        res = self.iriCache.get(iri)
+        if res is not None:
+            return res
+        # OLS expects double-encoded entity IRIs
+        enc = quote(quote(iri, safe=''), safe='')
+        res = self.fetchit(f"{self.baseUrl}/entities/{enc}")
+        self.iriCache.set(iri, res)
+        return res
+
+    # -------------------- Resolution steps driver --------------------
+    def run(self, steps: Generator) -> Any:
+        # feeds a base class step generator with the result of each request
+        try:
+            request = next(steps)
+            while True:
+                request = steps.send(self.perform(request))
+        except StopIteration as done:
+            return done.value
+
+    def perform(self, request: tuple) -> Any:
+        kind = request[0]
+        if kind == 'entity':
+            return self.retrieveTaxonByIRI(request[1])
+        if kind == 'ols':
+            return self.ols(request[1], request[2])
+        if kind == 'fetch':
+            return self.fetchit(request[1], request[2])
+        if kind == 'ncbi':
+            return self.ncbiMapper
+        return [self.perform(r) for r in request[1]]
+
+    def getTaxonByIRI(self, iri: str) -> Optional[Dict[str, Any]]:
+        return self.run(self._getTaxonByIRISteps(iri))
+
+    # -------------------- Suggestions (OLS autosuggest) --------------------
+    def getSuggestions(self, query: str) -> List[str]:
+        return self.run(self._getSuggestionsSteps(query))
+
+    # -------------------- Input resolution (tunable) --------------------
+    def resolveToLatest(self, inputRaw: Any, options: Dict[str, bool] = None) -> Dict[str, Any]:
+        return self.run(self._resolveToLatestSteps(inputRaw, options))
+
+    # -------------------- Batch resolution --------------------
+    def resolveMany(self, inputs: Iterable[Any], options: Dict[str, bool] = None,
+                    max_workers: int = 8, stream: bool = False,
+                    progress: Optional[Callable[[int, int], None]] = None
+                    ) -> Union[List[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+        # resolveToLatest() of each distinct input on a thread pool, results in input order
+        # (stream=True: as an iterator); failures give status 'error'
+        results = self._resolveManyIter([self._batchKey(x) for x in inputs], options, max_workers, progress)
+        return results if stream else list(results)
+
+    def _resolveManyIter(self, keys: List[Any], options: Optional[Dict[str, bool]], max_workers: int,
+                         progress: Optional[Callable[[int, int], None]]) -> Iterator[Dict[str, Any]]:
+        unique = list(dict.fromkeys(keys))
+        done: Dict[Any, Dict[str, Any]] = {}
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        futures = {pool.submit(self._resolveOne, key, options): key for key in unique}
+        try:
+            completed = as_completed(futures)
+            for key in keys:
+                while key not in done:
+                    f = next(completed)
+                    done[futures[f]] = f.result()
+                    if progress:
+                        progress(len(done), len(unique))
+                yield done[key]
+        finally:
+            # an abandoned stream does not wait for the remaining inputs
+            for f in futures:
+                f.cancel()
+            pool.shutdown()
+
+    def _resolveOne(self, inputRaw: Any, options: Optional[Dict[str, bool]]) -> Dict[str, Any]:
+        try:
+            return self.resolveToLatest(inputRaw, options)
+        except Exception as e:
+            return {'status': 'error', 'input': inputRaw, 'reason': str(e)}
+
+    # -------------------- Replacement chain --------------------
+    def followReplacements(self, entity: Dict[str, Any], options: Dict[str, bool]) -> List[Dict[str, Any]]:
+        return self.run(self._followReplacementsSteps(entity, options))
+
+    # -------------------- Lineage enrichment --------------------
+    def enrichLineage(self, mapped: Dict[str, Any]) -> Dict[str, Any]:
+        return self.run(self._enrichLineageSteps(mapped))
+
+    # -------------------- Seekers --------------------
+    def seekOntologyTaxon(self, endpoint: str, params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        return self.run(self._seekOntologyTaxonSteps(endpoint, params))
+
+    def seekOntologyTaxonByClassId(self, id_: str) -> List[Dict[str, Any]]:
+        return self.run(self._seekOntologyTaxonByClassIdSteps(id_))
+
+    def seekOntologyTaxonByClassLabel(self, label: str) -> List[Dict[str, Any]]:
+        return self.run(self._seekOntologyTaxonByClassLabelSteps(label))
+
+    def seekOntologyTaxonBySynonym(self, synonym: str) -> List[Dict[str, Any]]:
+        return self.run(self._seekOntologyTaxonBySynonymSteps(synonym))
+
+    def seekOntologyTaxonByIndividual(self, labelOrSyn: str) -> List[Dict[str, Any]]:
+        return self.run(self._seekOntologyTaxonByIndividualSteps(labelOrSyn))
+
+    # -------------------- Extras / Public helpers --------------------
+    def getCurrentReplacements(self, idOrLabelOrEntity: Any) -> List[Dict[str, Any]]:
+        return self.run(self._getCurrentReplacementsSteps(idOrLabelOrEntity))
+
+    def findCandidates(self, idOrLabel: str) -> List[Dict[str, Any]]:
+        return self.run(self._findCandidatesSteps(idOrLabel))
+
+    def findLatest(self, idOrLabel: str) -> Optional[Dict[str, Any]]:
+        return self.run(self._findLatestSteps(idOrLabel))
+
+    def getSynonyms(self, idOrLabelOrEntity: Any) -> List[str]:
+        return self.run(self._getSynonymsSteps(idOrLabelOrEntity))
+
+    def getIndividuals(self, idOrLabelOrEntity: Any) -> Dict[str, Any]:
+        return self.run(self._getIndividualsSteps(idOrLabelOrEntity))
+
+    def getIndividualsNames(self, idOrLabelOrEntity: Any) -> List[str]:
+        return self.run(self._getIndividualsNamesSteps(idOrLabelOrEntity))
+
+    def getAllFromRelease(self, release: str) -> List[Dict[str, Any]]:
+        return self.run(self._getAllFromReleaseSteps(release))
+
+    def getTaxonByRelease(self, ictvId: str, release: str) -> Optional[Dict[str, Any]]:
+        return self.run(self._getTaxonByReleaseSteps(ictvId, release))
+
+    def getHistory(self, idOrLabelOrEntity: Any) -> List[Dict[str, Any]]:
+        return self.run(self._getHistorySteps(idOrLabelOrEntity))
+
+    def getHistoricalParent(self, idOrLabelOrEntity: Any) -> Optional[Dict[str, Any]]:
+        return self.run(self._getHistoricalParentSteps(idOrLabelOrEntity))
+
+    def getObsolescenceReason(self, idOrLabelOrEntity: Any) -> Optional[str]:
+        return self.run(self._getObsolescenceReasonSteps(idOrLabelOrEntity))
+
+    def getTextualObsolescenceReason(self, idOrLabelOrEntity: Any) -> Optional[str]:
+        return self.run(self._getTextualObsolescenceReasonSteps(idOrLabelOrEntity))
+
+
+# ======================================================================
+#                         ICTV OLS API Helper (asyncio)
+# ======================================================================
+
+# asyncio counterpart of ICTVOLSClient over an httpx.AsyncClient, running the
+# same resolution steps; at most maxConcurrency requests in flight, concurrent
+# fetches of one entity or query shared, 429/5xx retried with backoff
+class AsyncICTVOLSClient(ICTVOLSBase):
+    def __init__(self, baseUrl: str = 'https://www.ebi.ac.uk/ols4/api/v2/ontologies/ictv',
+                 maxConcurrency: int = 32,
+                 timeout: float = 30,
+                 retries: int = 5,
+                 backoffFactor: float = 0.5,
+                 statusForcelist: tuple = (429, 500, 502, 503, 504),
+                 client: Optional[httpx.AsyncClient] = None,
+                 iriCache: Optional[ICTVLRUCache] = None,
+                 classCache: Optional[ICTVLRUCache] = None):
+        if httpx is None and client is None:
+            raise ImportError("AsyncICTVOLSClient requires httpx (pip install httpx)")
+        super().__init__(baseUrl, iriCache, classCache)
+        self.timeout: float = timeout
+        self.retries: int = retries
+        self.backoffFactor: float = backoffFactor
+        self.statusForcelist: tuple = statusForcelist
+        self.client: httpx.AsyncClient = client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=maxConcurrency, max_keepalive_connections=maxConcurrency)
+        )
+        self.semaphore = asyncio.Semaphore(maxConcurrency)
+        # the SSSOM map is fetched here, asynchronously, and handed to the
+        # mapper, which so never creates its own requests transport
+        self.ncbiMapper: ICTVtoNCBImapping = ICTVtoNCBImapping()
+        self.ncbiLock = asyncio.Lock()
+        self.versionLock = asyncio.Lock()
+        # (cache, key) -> task fetching it
+        self.inflight: Dict[Any, asyncio.Future] = {}
+
+    async def __aenter__(self) -> AsyncICTVOLSClient:
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    # -------------------- HTTP --------------------
+    async def get(self, url: str, params: Optional[Dict[str, Any]] = None,
+                  timeout: Optional[float] = None) -> httpx.Response:
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            # the concurrency slot is only held for the request, not the backoff
+            try:
+                async with self.semaphore:
+                    r = await self.client.get(url, params=params, headers=self.headers,
+                                              timeout=self.timeout if timeout is None else timeout)
+            except httpx.TransportError as e:
+                if last:
+                    raise Exception(f"Fetch failed (N/A) for {url}: {e}")
+                await asyncio.sleep(self.backoff(attempt))
+                continue
+            if r.status_code in self.statusForcelist and not last:
+                await asyncio.sleep(self.retryAfter(r) or self.backoff(attempt))
+                continue
+            if r.is_error:
+                raise Exception(f"Fetch failed ({r.status_code}) for {r.url}: {r.reason_phrase}")
+            return r
+
+    def backoff(self, attempt: int) -> float:
+        # exponential, with jitter so that throttled requests do not all retry at once
+        return self.backoffFactor * (2 ** attempt) * (0.5 + random.random() / 2)
+
+    def retryAfter(self, r: httpx.Response) -> Optional[float]:
+        value = r.headers.get('Retry-After')
+        if not value:
+            return None
+        if value.strip().isdigit():
+            return float(value)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - parsedate_to_datetime(r.headers['Date']).timestamp())
+        except (TypeError, ValueError, KeyError):
+            return None
+
+    async def fetchit(self, url: str, params: Optional[Dict[str, Any]] = None,
+                      timeout: Optional[float] = None) -> Dict[str, Any]:
+        return (await self.get(url, params or {}, timeout)).json()
+
+    async def checkCacheVersion(self, force: bool = False) -> None:
+        # As ICTVOLSClient.checkCacheVersion
+        caches = self.versionedCaches()
+        if caches and (force or any(cache.needsVersionCheck() for cache in caches)):
+            async with self.versionLock:
+                if force or any(cache.needsVersionCheck() for cache in caches):
+                    version = self.ontologyVersion(await self.fetchit(self.baseUrl))
+                    for cache in caches:
+                        cache.setVersion(version)
+
+    async def cached(self, cache: ICTVLRUCache, key: str, fetch: Callable[[], Any]) -> Any:
+        # cache.get(key), fetched once even when requested concurrently
+        await self.checkCacheVersion()
+        value = cache.get(key)
+        if value is not None:
+            return value
+        inflightKey = (id(cache), key)
+        task = self.inflight.get(inflightKey)
+        if task is None:
+            async def load() -> Any:
+                try:
+                    value = await fetch()
+                    cache.set(key, value)
+                    return value
+                finally:
+                    self.inflight.pop(inflightKey, None)
+            task = self.inflight[inflightKey] = asyncio.ensure_future(load())
+        # a cancelled caller does not cancel the fetch the others wait for
+        return await asyncio.shield(task)
+
+    async def ols(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        params = params.copy() if params else {}
+        params.setdefault("size", 1000)
+        return await self.cached(self.classCache, self._cache_key(endpoint, params),
+                                 lambda: self.fetchit(f"{self.baseUrl}/{endpoint}", params))
+
+    async def loadNcbiMap(self) -> None:
+        if self.ncbiMapper.ncbiMap is not None:
+            return
+        async with self.ncbiLock:
+            if self.ncbiMapper.ncbiMap is None:
+                text = (await self.get(self.ncbiMapper.sssomUrl)).text
+                self.ncbiMapper.ncbiMap = self.ncbiMapper.parseNcbiMap(text)
+
+    # -------------------- entity fetch (with cache) --------------------
+    async def retrieveTaxonByIRI(self, iri: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not iri:
+            return None
+        # OLS expects double-encoded entity IRIs
+        enc = quote(quote(iri, safe=''), safe='')
+        return await self.cached(self.iriCache, iri, lambda: self.fetchit(f"{self.baseUrl}/entities/{enc}"))
+
+
+    # -------------------- Resolution steps driver --------------------
+    async def run(self, steps: Generator) -> Any:
+        # As ICTVOLSClient.run, awaiting each request
+        try:
+            request = next(steps)
+            while True:
+                request = steps.send(await self.perform(request))
+        except StopIteration as done:
+            return done.value
+
+    async def perform(self, request: tuple) -> Any:
+        kind = request[0]
+        if kind == 'entity':
+            return await self.retrieveTaxonByIRI(request[1])
+        if kind == 'ols':
+            return await self.ols(request[1], request[2])
+        if kind == 'fetch':
+            return await self.fetchit(request[1], request[2])
+        if kind == 'ncbi':
+            await self.loadNcbiMap()
+            return self.ncbiMapper
+        return list(await asyncio.gather(*(self.perform(r) for r in request[1])))
+
+    async def getTaxonByIRI(self, iri: str) -> Optional[Dict[str, Any]]:
+        return await self.run(self._getTaxonByIRISteps(iri))
+
+    # -------------------- Suggestions (OLS autosuggest) --------------------
+    async def getSuggestions(self, query: str) -> List[str]:
+        return await self.run(self._getSuggestionsSteps(query))
+
+    # -------------------- Input resolution (tunable) --------------------
+    async def resolveToLatest(self, inputRaw: Any, options: Dict[str, bool] = None) -> Dict[str, Any]:
+        return await self.run(self._resolveToLatestSteps(inputRaw, options))
+
+    # -------------------- Batch resolution --------------------
+    async def resolveMany(self, inputs: Iterable[Any], options: Dict[str, bool] = None,
+                          progress: Optional[Callable[[int, int], None]] = None) -> List[Dict[str, Any]]:
+        # As ICTVOLSClient.resolveMany, all distinct inputs resolved concurrently
+        keys = [self._batchKey(x) for x in inputs]
+        unique = list(dict.fromkeys(keys))
+        done = 0
+
+        async def resolveOne(inputRaw: Any) -> Dict[str, Any]:
+            nonlocal done
+            try:
+                res = await self.resolveToLatest(inputRaw, options)
+            except Exception as e:
+                res = {'status': 'error', 'input': inputRaw, 'reason': str(e)}
+            done += 1
+            if progress:
+                progress(done, len(unique))
+            return res
+
+        results = dict(zip(unique, await asyncio.gather(*(resolveOne(key) for key in unique))))
+        return [results[key] for key in keys]
+
+
+    # -------------------- Replacement chain --------------------
+    async def followReplacements(self, entity: Dict[str, Any], options: Dict[str, bool]) -> List[Dict[str, Any]]:
+        return await self.run(self._followReplacementsSteps(entity, options))
+
+    # -------------------- Lineage enrichment --------------------
+    async def enrichLineage(self, mapped: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.run(self._enrichLineageSteps(mapped))
+
+    # -------------------- Seekers --------------------
+    async def seekOntologyTaxon(self, endpoint: str, params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        return await self.run(self._seekOntologyTaxonSteps(endpoint, params))
+
+    async def seekOntologyTaxonByClassId(self, id_: str) -> List[Dict[str, Any]]:
+        return await self.run(self._seekOntologyTaxonByClassIdSteps(id_))
+
+    async def seekOntologyTaxonByClassLabel(self, label: str) -> List[Dict[str, Any]]:
+        return await self.run(self._seekOntologyTaxonByClassLabelSteps(label))
+
+    async def seekOntologyTaxonBySynonym(self, synonym: str) -> List[Dict[str, Any]]:
+        return await self.run(self._seekOntologyTaxonBySynonymSteps(synonym))
+
+    async def seekOntologyTaxonByIndividual(self, labelOrSyn: str) -> List[Dict[str, Any]]:
+        return await self.run(self._seekOntologyTaxonByIndividualSteps(labelOrSyn))
+
+    # -------------------- Extras / Public helpers --------------------
+    async def getCurrentReplacements(self, idOrLabelOrEntity: Any) -> List[Dict[str, Any]]:
+        return await self.run(self._getCurrentReplacementsSteps(idOrLabelOrEntity))
+
+    async def findCandidates(self, idOrLabel: str) -> List[Dict[str, Any]]:
+        return await self.run(self._findCandidatesSteps(idOrLabel))
+
+    async def findLatest(self, idOrLabel: str) -> Optional[Dict[str, Any]]:
+        return await self.run(self._findLatestSteps(idOrLabel))
+
+    async def getSynonyms(self, idOrLabelOrEntity: Any) -> List[str]:
+        return await self.run(self._getSynonymsSteps(idOrLabelOrEntity))
+
+    async def getIndividuals(self, idOrLabelOrEntity: Any) -> Dict[str, Any]:
+        return await self.run(self._getIndividualsSteps(idOrLabelOrEntity))
+
+    async def getIndividualsNames(self, idOrLabelOrEntity: Any) -> List[str]:
+        return await self.run(self._getIndividualsNamesSteps(idOrLabelOrEntity))
+
+    async def getAllFromRelease(self, release: str) -> List[Dict[str, Any]]:
+        return await self.run(self._getAllFromReleaseSteps(release))
+
+    async def getTaxonByRelease(self, ictvId: str, release: str) -> Optional[Dict[str, Any]]:
+        return await self.run(self._getTaxonByReleaseSteps(ictvId, release))
+
+    async def getHistory(self, idOrLabelOrEntity: Any) -> List[Dict[str, Any]]:
+        return await self.run(self._getHistorySteps(idOrLabelOrEntity))
+
+    async def getHistoricalParent(self, idOrLabelOrEntity: Any) -> Optional[Dict[str, Any]]:
+        return await self.run(self._getHistoricalParentSteps(idOrLabelOrEntity))
+
+    async def getObsolescenceReason(self, idOrLabelOrEntity: Any) -> Optional[str]:
+        return await self.run(self._getObsolescenceReasonSteps(idOrLabelOrEntity))
+
+    async def getTextualObsolescenceReason(self, idOrLabelOrEntity: Any) -> Optional[str]:
+        return await self.run(self._getTextualObsolescenceReasonSteps(idOrLabelOrEntity))
+
+
 # ======================================================================
 #                           ICTV/NCBI Mapping
 # ======================================================================
 
 class ICTVtoNCBImapping:
-    def __init__(self):
+    def __init__(self, transport: Optional[ICTVHttpTransport] = None):
+        # created on first fetch when not shared by a client
+        self.transport: Optional[ICTVHttpTransport] = transport
         self.sssomUrl: str = ('https://raw.githubusercontent.com/EVORA-project/virus-taxonomy-mappings/'
                               'refs/heads/dev/mappings/ictv_ncbitaxon_exact.sssom.tsv')
         self.ncbiMap: Optional[Dict[str, Dict[str, List[Dict[str, Any]]]]] = None  # {'forward': {}, 'reverse': {}}
+        # loads the map once when first used by concurrent resolutions
+        self.loadLock = threading.Lock()
 
     def setDifferentSssomUrl(self, sssomUrl: str) -> None:
         self.sssomUrl = sssomUrl
@@ -590,14 +1059,23 @@ class ICTVtoNCBImapping:
     def loadNcbiMap(self) -> None:
         if self.ncbiMap is not None:
             return
+        with self.loadLock:
+            if self.ncbiMap is None:
+                self._loadNcbiMap()
+
+    def _loadNcbiMap(self) -> None:
+        if self.transport is None:
+            self.transport = ICTVHttpTransport()
         try:
-            r = requests.get(self.sssomUrl, timeout=30)
-            r.raise_for_status()
-            text = r.text
+            text = self.transport.get(self.sssomUrl).text
         except requests.RequestException as e:
             raise Exception("Failed to fetch mapping file") from e
+        # only published once complete, for threads not holding the lock
+        self.ncbiMap = self.parseNcbiMap(text)
 
-        self.ncbiMap = {'forward': {}, 'reverse': {}}
+    # SSSOM TSV → {'forward': {ictv curie: [...]}, 'reverse': {ncbi curie: [...]}}
+    def parseNcbiMap(self, text: str) -> Dict[str, Dict[str, List[Dict[str, Any]]]]:
+        ncbiMap: Dict[str, Dict[str, List[Dict[str, Any]]]] = {'forward': {}, 'reverse': {}}
         rows = [line for line in text.splitlines() if line.strip()]
         if rows:
             rows = rows[1:]  # skip header
@@ -611,17 +1089,18 @@ class ICTVtoNCBImapping:
             label = cols[4]
 
             # forward
-            self.ncbiMap['forward'].setdefault(ictvCurie, []).append({'ncbiCurie': ncbiCurie, 'label': label})
+            ncbiMap['forward'].setdefault(ictvCurie, []).append({'ncbiCurie': ncbiCurie, 'label': label})
 
             # reverse
             m = re.match(r'^ictv:([^/]+)/([^/]+)$', ictvCurie, flags=re.IGNORECASE)
             if m:
-                self.ncbiMap['reverse'].setdefault(ncbiCurie, []).append({
+                ncbiMap['reverse'].setdefault(ncbiCurie, []).append({
                     'ictv_curie': ictvCurie,
                     'msl': m.group(1),
                     'ictv_id': m.group(2),
                     'label': label
                 })
+        return ncbiMap
 
     # ICTV → NCBI (same MSL).
     def getNcbiTaxon(self, ictvId: str, msl: str) -> List[Dict[str, Any]]:
@@ -649,3 +1128,231 @@ class ICTVtoNCBImapping:
         for v in best.values():
             v.pop('_msl', None)
         return list(best.values())
+
+
+# ======================================================================
+#                              HTTP transport
+# ======================================================================
+
+# pooled keep-alive session, GETs retried with backoff on 429/5xx (honours Retry-After)
+class ICTVHttpTransport:
+    def __init__(self,
+                 timeout: Any = 30,
+                 retries: int = 5,
+                 backoffFactor: float = 0.5,
+                 statusForcelist: tuple = (429, 500, 502, 503, 504),
+                 poolConnections: int = 4,
+                 poolMaxsize: int = 16,
+                 session: Optional[requests.Session] = None):
+        # default timeout of every call: seconds, or a (connect, read) tuple
+        self.timeout: Any = timeout
+        self.session: requests.Session = session or requests.Session()
+        self.session.headers.setdefault("Accept-Encoding", "gzip, deflate")
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoffFactor,
+            status_forcelist=statusForcelist,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+            # the last response is returned and raised by raise_for_status()
+            raise_on_status=False,
+        )
+        # poolConnections hosts kept alive, poolMaxsize connections each
+        # (one per thread using the session concurrently)
+        adapter = HTTPAdapter(pool_connections=poolConnections, pool_maxsize=poolMaxsize, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None,
+            headers: Optional[Dict[str, str]] = None, timeout: Any = None) -> requests.Response:
+        r = self.session.get(url, params=params, headers=headers,
+                             timeout=self.timeout if timeout is None else timeout)
+        r.raise_for_status()
+        return r
+
+    def close(self) -> None:
+        self.session.close()
+
+
+# ======================================================================
+#                                  Caches
+# ======================================================================
+
+# thread-safe LRU cache bounded to maxEntries and/or maxBytes (values sized as
+# JSON), entries expiring ttl seconds after being set; None disables a limit
+class ICTVLRUCache:
+    def __init__(self, maxEntries: Optional[int] = None, maxBytes: Optional[int] = None,
+                 ttl: Optional[float] = None):
+        self.maxEntries: Optional[int] = maxEntries
+        self.maxBytes: Optional[int] = maxBytes
+        self.ttl: Optional[float] = ttl
+        # key -> (value, expiry time or None, size), least recently used first
+        self.entries: OrderedDict = OrderedDict()
+        self.bytes: int = 0
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key: str) -> Any:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value: Any) -> None:
+        # sizes are only computed when there is a byte limit
+        size = len(json.dumps(value)) if self.maxBytes is not None else 0
+        expiry = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (value, expiry, size)
+            self.bytes += size
+            while self.entries and (
+                (self.maxEntries is not None and len(self.entries) > self.maxEntries) or
+                (self.maxBytes is not None and self.bytes > self.maxBytes)
+            ):
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        self.bytes -= self.entries.pop(key)[2]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+# persistent cache in an SQLite file shared by threads and processes, values
+# stored as zlib-compressed JSON per namespace, emptied on a new MSL release
+class ICTVSQLiteCache:
+    SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS entries (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value BLOB NOT NULL,
+        PRIMARY KEY (namespace, key)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS metadata (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    '''
+
+    def __init__(self, path: str, namespace: str = 'default',
+                 versionCheckInterval: float = 3600, compressLevel: int = 6):
+        self.path: str = path
+        self.namespace: str = namespace
+        self.versionCheckInterval: float = versionCheckInterval
+        self.compressLevel: int = compressLevel
+        # one connection per thread and process, closed together by close()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections: List[tuple] = []  # (pid, connection)
+        self.generation: int = 0
+        # wall clock time of the next version check, 0 to read it from the file
+        self.nextVersionCheck: float = 0
+        self.hits = self.misses = 0
+        with self.connection() as db:
+            db.executescript(self.SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        # a connection is not reused in a forked child nor after close()
+        owner = (os.getpid(), self.generation)
+        if getattr(self.local, 'owner', None) != owner:
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = NORMAL')
+            self.local.db, self.local.owner = db, owner
+            with self.lock:
+                self.connections.append((owner[0], db))
+        return self.local.db
+
+    def close(self) -> None:
+        # connections inherited through fork() are the parent's to close
+        pid = os.getpid()
+        with self.lock:
+            self.generation += 1
+            connections = [db for owner, db in self.connections if owner == pid]
+            self.connections = []
+        for db in connections:
+            db.close()
+
+    def __enter__(self) -> ICTVSQLiteCache:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def get(self, key: str) -> Any:
+        row = self.connection().execute(
+            'SELECT value FROM entries WHERE namespace = ? AND key = ?', (self.namespace, key)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, key: str, value: Any) -> None:
+        blob = zlib.compress(json.dumps(value, separators=(',', ':')).encode(), self.compressLevel)
+        with self.connection() as db:
+            db.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)', (self.namespace, key, blob))
+
+    def metadata(self, key: str) -> Optional[str]:
+        row = self.connection().execute('SELECT value FROM metadata WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def needsVersionCheck(self) -> bool:
+        if time.time() < self.nextVersionCheck:
+            return False
+        # another process may have checked since
+        checkedAt = float(self.metadata('version_checked_at') or 0)
+        self.nextVersionCheck = checkedAt + self.versionCheckInterval
+        return time.time() >= self.nextVersionCheck
+
+    def setVersion(self, version: Optional[str]) -> None:
+        # Record the current ontology version, emptying the cache if it changed
+        db = self.connection()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            if self.metadata('version') != version:
+                db.execute('DELETE FROM entries')
+            db.execute('INSERT OR REPLACE INTO metadata VALUES (?, ?)', ('version', version))
+            db.execute('INSERT OR REPLACE INTO metadata VALUES (?, ?)', ('version_checked_at', str(time.time())))
+        self.nextVersionCheck = time.time() + self.versionCheckInterval
+
+    def clear(self) -> None:
+        with self.connection() as db:
+            db.execute('DELETE FROM entries WHERE namespace = ?', (self.namespace,))
+
+    def __len__(self) -> int:
+        return self.connection().execute(
+            'SELECT count(*) FROM entries WHERE namespace = ?', (self.namespace,)
+        ).fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,101 @@
+# Canonical form of the built ontology, for comparing builds
+#
+# The only blank nodes of the ontology are the owl:Axiom annotations of the
+# former names, which rdflib labels randomly on every parse. Here every blank
+# node is instead labelled by a hash of its triples (and, over a few rounds,
+# of those of its neighbour blank nodes), so that the same axiom gets the same
+# label in every build. Blank nodes with exactly the same triples get the same
+# label, i.e. are treated as one, which does not change the meaning of the
+# graph.
+#
+# Terms are written as in N-Triples, with plain and xsd:string literals both
+# written as plain literals (they are the same in RDF 1.1, but some stores
+# return one where others return the other).
+
+import gzip
+import hashlib
+import uuid
+
+import rdflib
+from rdflib import BNode, Literal
+from rdflib.namespace import XSD
+
+# rounds of blank node label refinement, i.e. the distance over which
+# connected blank nodes influence each other's label
+ROUNDS = 3
+
+
+def read_graph(path, format=None):
+    # Graph of a built ontology file, optionally gzipped. Unless given, the
+    # format is N-Triples for .nt files and Turtle otherwise.
+    name = path[:-3] if path.endswith('.gz') else path
+    g = rdflib.Graph()
+    with (gzip.open if path.endswith('.gz') else open)(path, 'rb') as f:
+        g.parse(f, format=format or ('nt' if name.endswith('.nt') else 'ttl'))
+    return g
+
+
+def canonical_lines(graph):
+    # The triples of the graph as N-Triples lines, blank nodes labelled by
+    # content (see bnode_labels)
+    labels = bnode_labels(graph)
+
+    def term(t):
+        if isinstance(t, BNode):
+            return labels[t]
+        return n3(t)
+
+    return {f'{term(s)} {term(p)} {term(o)} .\n' for s, p, o in graph}
+
+
+def bnode_labels(graph):
+    # blank node -> '_:b<hash>', the hash covering the predicates and terms of
+    # all triples the blank node is part of, refined over ROUNDS rounds
+
+    edges = {}
+    for s, p, o in graph:
+        if isinstance(s, BNode):
+            edges.setdefault(s, []).append(('>', n3(p), o))
+        if isinstance(o, BNode):
+            edges.setdefault(o, []).append(('<', n3(p), s))
+
+    labels = {b: '' for b in edges}
+    for _ in range(ROUNDS):
+        labels = {
+            b: hashlib.sha256('\n'.join(sorted(
+                f'{direction} {p} {labels[t] if isinstance(t, BNode) else n3(t)}'
+                for direction, p, t in b_edges
+            )).encode()).hexdigest()[:32]
+            for b, b_edges in edges.items()
+        }
+    return {b: '_:b' + label for b, label in labels.items()}
+
+
+def n3(t):
+    # N-Triples form of a term, literals escaped like rdflib's N-Triples
+    # serializer does (Literal.n3 may spread them over several lines)
+    if not isinstance(t, Literal):
+        return t.n3()
+    quoted = '"' + str(t).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"').replace('\r', '\\r') + '"'
+    if t.language:
+        return f'{quoted}@{t.language}'
+    if t.datatype and t.datatype != XSD.string:
+        return f'{quoted}^^<{t.datatype}>'
+    return quoted
+
+
+def write_patch(path, previous, current):
+    # Write the RDF Patch (https://afs.github.io/rdf-patch/) turning the
+    # previous canonical lines into the current ones: one transaction with
+    # the removed (D) then the added (A) triples, each sorted. Returns the
+    # number of added and removed triples.
+
+    removed = sorted(previous - current)
+    added = sorted(current - previous)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'H id <urn:uuid:{uuid.uuid4()}> .\n')
+        f.write('TX .\n')
+        f.writelines('D ' + line for line in removed)
+        f.writelines('A ' + line for line in added)
+        f.write('TC .\n')
+    return len(added), len(removed)
@@ -0,0 +1,166 @@
+# Reading of the ICTVdatabase TSV exports used by create_ontologies.py
+#
+# The node export contains a few malformed lines with one field too many.
+# Instead of parsing the whole file with pandas' slow pure-Python engine just
+# to be able to fix those in an on_bad_lines callback, the file is scanned
+# once in a streaming pass that reports the malformed lines, and is then
+# parsed with the C engine restricted to the header columns, which cuts the
+# extra fields off those lines. The resulting frames are identical.
+#
+# Parsed tables can be cached (see read_cached): as Feather files when
+# pyarrow is installed, which are memory-mapped on load, else as pickles.
+
+import csv
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+NODE_EXPORT = 'data/taxonomy_node_export.utf8.txt'
+DELTA = 'data/taxonomy_node_delta.utf8.txt'
+ISOLATES = 'data/species_isolates.utf8.txt'
+
+CHUNK_SIZE = 1 << 24
+
+
+def read_inputs(cache_dir=None):
+    # nodes, delta and isolates tables, from the cache in cache_dir if given
+    return (
+        read_cached(read_node_export, NODE_EXPORT, cache_dir),
+        read_cached(read_delta, DELTA, cache_dir),
+        read_cached(read_isolates, ISOLATES, cache_dir),
+    )
+
+
+def read_cached(reader, path, cache_dir=None):
+    # reader(path), cached in cache_dir under a hash of the source file, of
+    # this module and of the pandas version. A changed source file gets a
+    # new key, so the outdated table is simply never loaded again (and is
+    # removed when its replacement is stored).
+
+    if not cache_dir:
+        return reader(path)
+
+    h = hashlib.sha256()
+    for f_name in [path, __file__]:
+        with open(f_name, 'rb') as f:
+            while block := f.read(CHUNK_SIZE):
+                h.update(block)
+    h.update(pd.__version__.encode())
+
+    prefix = os.path.basename(path).split('.')[0] + '-'
+    cache_file = os.path.join(cache_dir, prefix + h.hexdigest()[:16] + ('.feather' if feather else '.pkl'))
+
+    if os.path.exists(cache_file):
+        if feather:
+            # memory-mapped: the column buffers are paged in from the file on
+            # use and shared by all processes reading the same table
+            return feather.read_table(cache_file, memory_map=True).to_pandas()
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+
+    table = reader(path)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    for f_name in os.listdir(cache_dir):
+        if f_name.startswith(prefix):
+            os.remove(os.path.join(cache_dir, f_name))
+
+    tmp_file = cache_file + '.tmp'
+    if feather:
+        feather.write_feather(table, tmp_file, compression='uncompressed')
+    else:
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(table, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, cache_file)
+
+    return table
+
+
+def read_node_export(path=NODE_EXPORT):
+    return read_tsv(path, repair=True)
+
+
+def read_delta(path=DELTA):
+    return read_tsv(path)
+
+
+def read_isolates(path=ISOLATES):
+    return read_tsv(path)
+
+
+def read_tsv(path, repair=False):
+    # All columns are read as strings, missing values as NaN. With repair,
+    # records with more fields than the header are cut to the header width
+    # instead of failing the parse.
+
+    if not repair:
+        return pd.read_csv(path, sep='\t', dtype=str, engine='c')
+
+    with open(path, encoding='utf-8', newline='') as f:
+        width = len(next(csv.reader(f, delimiter='\t')))
+
+    malformed = find_malformed_lines(path, width)
+    if malformed:
+        print(f'Repairing {len(malformed)} malformed line(s) in {path} (expected {width} fields):')
+        for line_num, fields in malformed[:20]:
+            print(f'  line {line_num}: {fields} fields, dropping the last {fields - width}')
+        if len(malformed) > 20:
+            print(f'  ... and {len(malformed) - 20} more')
+
+    return pd.read_csv(path, sep='\t', dtype=str, engine='c', usecols=range(width))
+
+
+def find_malformed_lines(path, width):
+    # (line number, number of fields) of every line with more than `width`
+    # fields, counting the tabs of each line chunk by chunk with numpy. Files
+    # with quoted fields, where a tab or a newline may be part of a value, are
+    # scanned record by record with the csv module instead.
+
+    malformed = []
+    line_num = 0
+    tabs_in_line = 0
+
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            if b'"' in chunk:
+                return find_malformed_records(path, width)
+
+            data = np.frombuffer(chunk, dtype=np.uint8)
+            tabs = np.cumsum(data == ord('\t'))
+            line_ends = np.flatnonzero(data == ord('\n'))
+            if len(line_ends) == 0:
+                tabs_in_line += int(tabs[-1])
+                continue
+
+            tabs_at_end = tabs[line_ends]
+            tabs_per_line = np.diff(tabs_at_end, prepend=0)
+            tabs_per_line[0] += tabs_in_line
+            for i in np.flatnonzero(tabs_per_line >= width):
+                malformed.append((line_num + int(i) + 1, int(tabs_per_line[i]) + 1))
+
+            line_num += len(line_ends)
+            tabs_in_line = int(tabs[-1] - tabs_at_end[-1])
+
+    # last line without a trailing newline
+    if tabs_in_line >= width:
+        malformed.append((line_num + 1, tabs_in_line + 1))
+
+    return malformed
+
+
+def find_malformed_records(path, width):
+    malformed = []
+    with open(path, encoding='utf-8', newline='') as f:
+        reader = csv.reader(f, delimiter='\t')
+        for record in reader:
+            if len(record) > width:
+                malformed.append((reader.line_num, len(record)))
+    return malformed
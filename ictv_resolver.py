@@ -0,0 +1,104 @@
+# Offline resolution index written next to the ontology by create_ontologies.py
+#
+# An SQLite database mapping every name, synonym, ICTV ID, isolate name and
+# GenBank/RefSeq accession to the classes of all releases, with the final
+# replacements of obsolete classes and the lineage of every class. Resolving
+# a name then takes a few indexed lookups instead of OLS round-trips:
+#
+#   SELECT c.* FROM names n JOIN classes c ON c.iri = n.iri
+#   WHERE n.name = ? ORDER BY c.msl DESC
+#
+#   SELECT c.* FROM replacements r JOIN classes c ON c.iri = r.replacement_iri
+#   WHERE r.iri = ?
+#
+# Names are stored normalized by normalize_name (case-folded, whitespace
+# collapsed) and must be looked up normalized the same way. Accessions are
+# stored without their 'genbank:'/'refseq:' prefix, and the accessions of
+# segments (e.g. 'DNA-A: AB123456') both with and without their label.
+
+import os
+import re
+import sqlite3
+
+SCHEMA_VERSION = 1
+
+WHITESPACE = re.compile(r'\s+')
+
+SCHEMA = '''
+CREATE TABLE metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+-- every class of every release
+CREATE TABLE classes (
+    iri TEXT PRIMARY KEY,
+    ictv_id TEXT NOT NULL,
+    msl INTEGER NOT NULL,
+    label TEXT,
+    rank TEXT,
+    parent_iri TEXT,
+    -- JSON array of the ICTV IDs of the ancestors in the same release, top first
+    lineage TEXT NOT NULL,
+    is_obsolete INTEGER NOT NULL,
+    -- MERGED or SPLIT, as in the ontology
+    obsolescence_reason TEXT
+);
+
+-- normalized name -> class, kind being one of label, synonym, identifier,
+-- isolate, isolate_synonym, genbank or refseq
+CREATE TABLE names (
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    iri TEXT NOT NULL,
+    PRIMARY KEY (name, kind, iri)
+) WITHOUT ROWID;
+
+-- obsolete class -> its final replacement(s) in the latest release
+CREATE TABLE replacements (
+    iri TEXT NOT NULL,
+    replacement_iri TEXT NOT NULL,
+    PRIMARY KEY (iri, replacement_iri)
+) WITHOUT ROWID;
+'''
+
+
+def normalize_name(name):
+    return WHITESPACE.sub(' ', name).strip().casefold()
+
+
+def write_resolver_index(path, classes, names, replacements, metadata):
+    # Write the index to path, replacing any earlier one once complete.
+    # classes: rows of the classes table, in its column order
+    # names: (name, kind, iri) rows, names not normalized yet
+    # replacements: (iri, replacement_iri) rows
+    # metadata: key -> value
+
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    db = sqlite3.connect(tmp_path)
+    try:
+        # a fresh file that is only renamed into place when complete needs
+        # no journal nor fsyncs
+        db.execute('PRAGMA journal_mode = OFF')
+        db.execute('PRAGMA synchronous = OFF')
+        db.executescript(SCHEMA)
+
+        metadata = dict(metadata, schema_version=SCHEMA_VERSION, normalization='casefold, whitespace collapsed')
+        db.executemany('INSERT INTO metadata VALUES (?, ?)', ((k, str(v)) for k, v in metadata.items()))
+        db.executemany('INSERT INTO classes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', classes)
+        db.executemany(
+            'INSERT OR IGNORE INTO names VALUES (?, ?, ?)',
+            ((key, kind, iri) for name, kind, iri in names if (key := normalize_name(name))),
+        )
+        db.executemany('INSERT OR IGNORE INTO replacements VALUES (?, ?)', replacements)
+        db.commit()
+
+        db.execute('ANALYZE')
+        db.execute('VACUUM')
+    finally:
+        db.close()
+
+    os.replace(tmp_path, path)